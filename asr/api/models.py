@@ -9,4 +9,26 @@ class TranscriptionResponse(BaseModel):
 
 
 class HealthCheck(BaseModel):
-    status: str = "OK"
\ No newline at end of file
+    status: str = "OK"
+
+
+class CacheStats(BaseModel):
+    hits: int
+    disk_hits: int
+    misses: int
+    entries: int
+    size_bytes: int
+    max_bytes: int
+
+
+class QueueStats(BaseModel):
+    workers: int
+    running: int
+    queue_depth: int
+    queue_size: int
+    queued_audio_s: float
+    estimated_wait_s: float
+    rtf: float
+    pool: str
+    admitted: int
+    rejected: int
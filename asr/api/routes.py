@@ -1,14 +1,31 @@
+import asyncio
+import contextlib
 from fastapi import APIRouter
 from api.models import *
-import os
-from fastapi import File, UploadFile, HTTPException, Depends
-import tempfile
-from common.auth.auth import require_valid_token
+from fastapi import File, UploadFile, HTTPException, Depends, Response, WebSocket, WebSocketDisconnect
+from common.auth.auth import require_valid_token, require_valid_token_ws
+import numpy as np
 
 
-from constants import MODEL
+from api.utils.audio import AudioDecodeError, StreamDecoder, decode_upload
+from api.utils.admission import ADMISSION, Overloaded
+from api.utils.audio import SAMPLE_RATE
+from api.utils.batching import SCHEDULER
+from api.utils.cache import CACHE, hash_upload
+from api.utils.chunking import transcribe_long
+from api.utils.engines import N_SAMPLES
+from api.utils.executor import EXECUTOR
+from api.utils.streaming import StreamTranscriber
+from common.metrics.metrics import Histogram
+from constants import CHUNK_S, LONG_AUDIO_S, STREAM_WINDOW_S
+
+TRANSCRIBE_SECONDS = Histogram(
+    "asr_transcribe_seconds",
+    "End-to-end latency of /transcribe, including decoding and the cache",
+)
 
 asr_router = APIRouter(tags=["ASR"], dependencies=[Depends(require_valid_token)])
+asr_stream_router = APIRouter(tags=["ASR"], dependencies=[Depends(require_valid_token_ws)])
 
 
 @asr_router.post("/transcribe", response_model=TranscriptionResponse)
@@ -16,7 +33,7 @@ async def transcribe_audio(file: UploadFile = File(...)):
     """
     Transcribe uploaded audio file to text using Whisper.
     
-    Supported audio formats: mp3, wav, m4a, mp4, mpga, m4v, avi, mov, flv, mkv, webm
+    Supported audio formats: mp3, wav, ogg, opus, flac, m4a, mp4, mpga, m4v, avi, mov, flv, mkv, webm
     """
     if not file.filename:
         raise Exception("FILENAME NOT FOUND")
@@ -24,53 +41,191 @@ async def transcribe_audio(file: UploadFile = File(...)):
     content_type = file.content_type
     if not content_type or not content_type.startswith("audio/"):
         # Allow some video formats that contain audio
-        allowed_extensions = [".mp3", ".wav", ".m4a", ".mp4", ".mpga", ".m4v", ".avi", ".mov", ".flv", ".mkv", ".webm"]
+        allowed_extensions = [".mp3", ".wav", ".ogg", ".oga", ".opus", ".flac", ".m4a", ".mp4", ".mpga", ".m4v", ".avi", ".mov", ".flv", ".mkv", ".webm"]
         if not any(file.filename.lower().endswith(ext) for ext in allowed_extensions):
             raise HTTPException(status_code=400, detail="File must be an audio or video file")
     
-    # Create a temporary file to store the uploaded audio
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_file:
-        try:
-            # Save the uploaded file to the temporary file
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-            
-            # Transcribe the audio using Whisper
-            result = MODEL.transcribe(temp_file_path)
-            
-            # Extract transcription details
-            if not isinstance(result, dict):
-                raise Exception("RESULT NOT DICT")
-            transcription_text = result["text"].strip() # type: ignore
-            detected_language = result.get("language", None)
-            
-            # Calculate duration
-            duration = None
-            if "segments" in result and len(result["segments"]) > 0:
-                last_segment = result["segments"][-1]
-                if not isinstance(last_segment, dict):
-                    raise Exception("LAST_SEGMENT NOT DICT")
-                duration = last_segment["end"] if "end" in last_segment else None
-            
-            return TranscriptionResponse(
-                text=transcription_text,
-                language=detected_language if isinstance(detected_language, str) else None,
-                duration=duration if isinstance(duration, float) else None
-            )
-            
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error processing audio file: {str(e)}")
+    with TRANSCRIBE_SECONDS.time():
+        # Resent audio (forwarded voice notes, retries) is served from the cache
+        key = CACHE.key(await hash_upload(file))
+        return await CACHE.get_or_compute(key, lambda: _transcribe_upload(file))
+
+
+async def _transcribe_upload(file: UploadFile) -> TranscriptionResponse:
+    # Decode the upload straight into memory, no temporary files
+    try:
+        audio = await decode_upload(file)
+    except AudioDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Error decoding audio file: {str(e)}")
+
+    # Reject up front if the job would wait too long behind queued work
+    try:
+        ADMISSION.admit(len(audio) / SAMPLE_RATE)
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=429,
+            detail="ASR service is overloaded, retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    try:
+        if EXECUTOR.workers > 1 and len(audio) > LONG_AUDIO_S * SAMPLE_RATE:
+            # Long recordings are split at silences and transcribed in parallel
+            result = await transcribe_long(EXECUTOR, audio, CHUNK_S)
+        elif len(audio) <= N_SAMPLES:
+            # Audio fitting one Whisper window is batched with concurrent requests
+            result = await SCHEDULER.transcribe(audio)
+        else:
+            # Longer audio gets a job of its own, short requests don't wait for it in a batch
+            result = await EXECUTOR.transcribe(audio)
+        
+        # Extract transcription details
+        if not isinstance(result, dict):
+            raise Exception("RESULT NOT DICT")
+        transcription_text = result["text"].strip() # type: ignore
+        detected_language = result.get("language", None)
         
+        # Calculate duration
+        duration = None
+        if "segments" in result and len(result["segments"]) > 0:
+            last_segment = result["segments"][-1]
+            if not isinstance(last_segment, dict):
+                raise Exception("LAST_SEGMENT NOT DICT")
+            duration = last_segment["end"] if "end" in last_segment else None
+        
+        return TranscriptionResponse(
+            text=transcription_text,
+            language=detected_language if isinstance(detected_language, str) else None,
+            duration=duration if isinstance(duration, float) else None
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing audio file: {str(e)}")
+
+
+@asr_stream_router.websocket("/transcribe/stream")
+async def transcribe_stream(
+    websocket: WebSocket,
+    encoding: str = "pcm_s16le",
+    window: float = STREAM_WINDOW_S,
+):
+    """
+    Transcribe audio pushed over a WebSocket, emitting segments as soon as
+    each window is decoded.
+
+    The client sends audio as binary messages and the text message `end`
+    once it is done. With `encoding=pcm_s16le` (default) the audio is raw
+    16 kHz mono 16-bit PCM, any other value means an encoded stream (ogg,
+    webm, mp3, ...) that is decoded with ffmpeg as it arrives.
+
+    Server messages:
+    - `{"type": "segment", "text", "start", "end", "language"}` for every segment
+    - `{"type": "done", "text", "language", "duration"}` once the audio is exhausted
+    - `{"type": "error", "detail"}` if decoding or transcription fails
+    """
+    await websocket.accept()
+    transcriber = StreamTranscriber(EXECUTOR, min(max(window, 5.0), 30.0))
+    samples: asyncio.Queue[np.ndarray | None] = asyncio.Queue()
+    decoder = StreamDecoder() if encoding != "pcm_s16le" else None
+
+    async def receive_audio():
+        remainder = b""
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                # Nobody is left to send the rest of the buffer to
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("text") == "end":
+                break
+            chunk = message.get("bytes")
+            if not chunk:
+                continue
+            if decoder is not None:
+                await decoder.write(chunk)
+            else:
+                pcm = remainder + chunk
+                split = len(pcm) - len(pcm) % 2
+                remainder = pcm[split:]
+                samples.put_nowait(np.frombuffer(pcm[:split], np.int16).astype(np.float32) / 32768.0)
+        if decoder is not None:
+            await decoder.close()
+        else:
+            samples.put_nowait(None)
+
+    async def read_decoded():
+        assert decoder is not None
+        try:
+            while (decoded := await decoder.read()) is not None:
+                samples.put_nowait(decoded)
         finally:
-            # Clean up the temporary file
-            try:
-                os.unlink(temp_file_path)
-            except OSError:
-                pass  # Ignore errors during cleanup
+            samples.put_nowait(None)
+
+    async def transcribe_samples():
+        final = False
+        while not final:
+            chunk = await samples.get()
+            if chunk is None:
+                final = True
+            else:
+                transcriber.feed(chunk)
+            while transcriber.ready(final):
+                for segment in await transcriber.step(final):
+                    await websocket.send_json({"type": "segment", **segment})
+
+    tasks = []
+    try:
+        if decoder is not None:
+            await decoder.start()
+            tasks.append(asyncio.create_task(read_decoded()))
+        receiver = asyncio.create_task(receive_audio())
+        transcribing = asyncio.create_task(transcribe_samples())
+        tasks += [receiver, transcribing]
+
+        # A disconnect stops the transcription instead of waiting for it
+        await asyncio.wait((receiver, transcribing), return_when=asyncio.FIRST_EXCEPTION)
+        if receiver.done() and receiver.exception() is not None:
+            raise receiver.exception()  # type: ignore[misc]
+        await asyncio.gather(*tasks)
+        await websocket.send_json({
+            "type": "done",
+            "text": transcriber.text,
+            "language": transcriber.language,
+            "duration": transcriber.duration,
+        })
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        # The client may be gone by now
+        with contextlib.suppress(WebSocketDisconnect, RuntimeError):
+            await websocket.send_json({"type": "error", "detail": f"Error processing audio stream: {str(e)}"})
+            await websocket.close(code=1011)
+    finally:
+        for task in tasks:
+            task.cancel()
+        if decoder is not None:
+            await decoder.kill()
 
 
 @asr_router.get("/health", response_model=HealthCheck)
-async def health_check():
-    """Health check endpoint to verify the service is running."""
-    return HealthCheck(status="OK")
\ No newline at end of file
+async def health_check(response: Response):
+    """
+    Health check endpoint to verify the service is running.
+    Responds 503 while the worker pool is being rebuilt or is broken.
+    """
+    if EXECUTOR.pool_state != "ok":
+        response.status_code = 503
+        return HealthCheck(status=EXECUTOR.pool_state.upper())
+    return HealthCheck(status="OK")
+
+
+@asr_router.get("/health/queue", response_model=QueueStats)
+async def queue_stats():
+    """Inference queue depth, estimated wait and admission counters."""
+    return ADMISSION.stats()
+
+
+@asr_router.get("/cache/stats", response_model=CacheStats)
+async def cache_stats():
+    """Hit/miss counters and size of the transcription cache."""
+    return CACHE.stats()
\ No newline at end of file
@@ -0,0 +1,57 @@
+import math
+
+from api.models import QueueStats
+from api.utils.executor import EXECUTOR, InferenceExecutor
+from common.metrics.metrics import CallbackCounter
+from constants import MAX_WAIT_S
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"ASR SERVICE OVERLOADED, RETRY AFTER {retry_after} S")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Rejects transcription jobs up front instead of queueing unbounded work.
+
+    A job is admitted while the executor queue has room and its estimated
+    wait, computed from the audio queued ahead of it under shortest-job-first
+    ordering and the measured real-time factor, stays under `max_wait_s`.
+    """
+
+    def __init__(self, executor: InferenceExecutor, max_wait_s: float):
+        self.executor = executor
+        self.max_wait_s = max_wait_s
+        self.admitted = 0
+        self.rejected = 0
+
+    def admit(self, duration: float):
+        wait = self.executor.estimate_wait(duration)
+        if self.executor.queue_depth >= self.executor.queue_size or wait > self.max_wait_s:
+            self.rejected += 1
+            # By then enough of the backlog is worked off for the job to fit
+            raise Overloaded(max(1, math.ceil(wait - self.max_wait_s)))
+        self.admitted += 1
+
+    def stats(self) -> QueueStats:
+        return QueueStats(
+            workers=self.executor.workers,
+            running=self.executor.running,
+            queue_depth=self.executor.queue_depth,
+            queue_size=self.executor.queue_size,
+            queued_audio_s=round(self.executor.queued_cost, 3),
+            estimated_wait_s=round(self.executor.estimate_wait(0.0), 3),
+            rtf=round(self.executor.rtf, 3),
+            pool=self.executor.pool_state,
+            admitted=self.admitted,
+            rejected=self.rejected,
+        )
+
+
+ADMISSION = AdmissionController(EXECUTOR, MAX_WAIT_S)
+
+
+CallbackCounter("asr_admitted_total", "Transcription jobs admitted to the queue", lambda: ADMISSION.admitted)
+CallbackCounter("asr_rejected_total", "Transcription jobs rejected with 429", lambda: ADMISSION.rejected)
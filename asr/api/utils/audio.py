@@ -0,0 +1,200 @@
+import asyncio
+import io
+import os
+import tempfile
+from typing import AsyncIterator
+
+import numpy as np
+from fastapi import UploadFile
+
+try:
+    import soundfile
+    import soxr
+except ImportError:  # native decoding is optional, ffmpeg handles everything
+    soundfile = None
+    soxr = None
+
+# Sample rate expected by Whisper
+SAMPLE_RATE = 16000
+CHUNK_SIZE = 1 << 16
+# Enough bytes to sniff the container format
+HEADER_SIZE = 64
+
+
+class AudioDecodeError(Exception):
+    pass
+
+
+def sniff_format(header: bytes) -> str | None:
+    """Detect the container of the common formats we receive by magic bytes"""
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "wav"
+    if header[:4] == b"OggS":
+        return "ogg"
+    if header[:4] == b"fLaC":
+        return "flac"
+    if header[:3] == b"ID3" or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return "mp3"
+    if header[4:8] == b"ftyp":
+        return "mp4"
+    return None
+
+
+def decode_native(data: bytes) -> np.ndarray:
+    """Decode WAV/OGG (Vorbis, Opus)/FLAC/MP3 in-process with libsndfile, skipping ffmpeg"""
+    if soundfile is None or soxr is None:
+        raise AudioDecodeError("NATIVE DECODER NOT AVAILABLE")
+    audio, sample_rate = soundfile.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    audio = audio.mean(axis=1)
+    if sample_rate != SAMPLE_RATE:
+        audio = soxr.resample(audio, sample_rate, SAMPLE_RATE)
+    return np.ascontiguousarray(audio, dtype=np.float32)
+
+
+def _ffmpeg_args(source: str) -> list[str]:
+    return [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", source,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE),
+        "-",
+    ]
+
+
+def _pcm_to_float(pcm: bytes) -> np.ndarray:
+    return np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
+
+
+async def decode_ffmpeg(chunks: AsyncIterator[bytes]) -> np.ndarray:
+    """Decode any ffmpeg-supported audio streamed into ffmpeg's stdin"""
+    process = await asyncio.create_subprocess_exec(
+        *_ffmpeg_args("pipe:0"),
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    assert process.stdin is not None
+
+    async def feed():
+        try:
+            async for chunk in chunks:
+                process.stdin.write(chunk)  # type: ignore
+                await process.stdin.drain()  # type: ignore
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # ffmpeg gave up early, the error is reported through stderr
+        finally:
+            process.stdin.close()  # type: ignore
+
+    feeder = asyncio.create_task(feed())
+    try:
+        stdout, stderr = await process.communicate()
+    finally:
+        await feeder
+    if process.returncode != 0:
+        raise AudioDecodeError(f"Failed to load audio: {stderr.decode(errors='ignore')[-500:]}")
+    return _pcm_to_float(stdout)
+
+
+async def decode_ffmpeg_seekable(data: bytes) -> np.ndarray:
+    """
+    Decode containers whose demuxer has to seek (MP4/M4A/MOV with the index
+    at the end of the file). These can't be read from a pipe, so they go
+    through a temporary file in shared memory when it is available.
+    """
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    with tempfile.NamedTemporaryFile(dir=directory) as temp_file:
+        temp_file.write(data)
+        temp_file.flush()
+        process = await asyncio.create_subprocess_exec(
+            *_ffmpeg_args(temp_file.name),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise AudioDecodeError(f"Failed to load audio: {stderr.decode(errors='ignore')[-500:]}")
+    return _pcm_to_float(stdout)
+
+
+async def _upload_chunks(header: bytes, file: UploadFile) -> AsyncIterator[bytes]:
+    yield header
+    while chunk := await file.read(CHUNK_SIZE):
+        yield chunk
+
+
+async def _bytes_chunks(data: bytes) -> AsyncIterator[bytes]:
+    view = memoryview(data)
+    for start in range(0, len(view), CHUNK_SIZE):
+        yield view[start:start + CHUNK_SIZE].tobytes()
+
+
+async def decode_upload(file: UploadFile) -> np.ndarray:
+    """
+    Decode an uploaded file to a 16 kHz mono float32 array without writing it
+    to disk. Common formats are decoded natively, everything else is streamed
+    into ffmpeg through a pipe.
+    """
+    header = await file.read(HEADER_SIZE)
+    if not header:
+        raise AudioDecodeError("EMPTY AUDIO FILE")
+    audio_format = sniff_format(header)
+    if audio_format == "mp4":
+        return await decode_ffmpeg_seekable(header + await file.read())
+    if audio_format is not None and soundfile is not None:
+        data = header + await file.read()
+        try:
+            return await asyncio.to_thread(decode_native, data)
+        except Exception:
+            # e.g. an Opus stream with an old libsndfile, let ffmpeg try
+            return await decode_ffmpeg(_bytes_chunks(data))
+    return await decode_ffmpeg(_upload_chunks(header, file))
+
+
+class StreamDecoder:
+    """
+    Incremental ffmpeg decoder for audio that arrives in pieces, e.g. an
+    OGG/WebM recording pushed while it is being recorded. Encoded bytes go
+    in through `write`, 16 kHz float32 samples come out of `read` as soon as
+    ffmpeg produces them.
+    """
+
+    def __init__(self):
+        self._process: asyncio.subprocess.Process | None = None
+        self._remainder = b""
+
+    async def start(self):
+        self._process = await asyncio.create_subprocess_exec(
+            *_ffmpeg_args("pipe:0"),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+
+    async def write(self, chunk: bytes):
+        assert self._process is not None and self._process.stdin is not None
+        try:
+            self._process.stdin.write(chunk)
+            await self._process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            raise AudioDecodeError("DECODER CLOSED")
+
+    async def close(self):
+        if self._process is not None and self._process.stdin is not None:
+            self._process.stdin.close()
+
+    async def read(self) -> np.ndarray | None:
+        """Next decoded samples, None once the stream is exhausted"""
+        assert self._process is not None and self._process.stdout is not None
+        pcm = await self._process.stdout.read(CHUNK_SIZE)
+        if not pcm:
+            if await self._process.wait() != 0:
+                raise AudioDecodeError("Failed to decode audio stream")
+            return None
+        pcm = self._remainder + pcm
+        split = len(pcm) - len(pcm) % 2
+        self._remainder = pcm[split:]
+        return _pcm_to_float(pcm[:split])
+
+    async def kill(self):
+        if self._process is not None and self._process.returncode is None:
+            self._process.kill()
+            await self._process.wait()
@@ -0,0 +1,69 @@
+import asyncio
+from typing import Any
+
+from api.utils.executor import EXECUTOR, InferenceExecutor
+from constants import BATCH_SIZE, BATCH_WINDOW_MS
+
+
+class BatchScheduler:
+    """
+    Collects concurrent transcription requests into micro-batches.
+
+    The first request of a batch opens a window of `window_ms` milliseconds,
+    the batch is sent to the executor when the window closes or as soon as it
+    holds `max_batch_size` requests. Each caller gets its own result back.
+    """
+
+    def __init__(self, executor: InferenceExecutor, max_batch_size: int, window_ms: float):
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = window_ms / 1000
+        self._pending: list[tuple[Any, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._running: set[asyncio.Task] = set()
+
+    async def transcribe(self, audio: Any) -> dict:
+        if self.max_batch_size == 1:
+            return await self.executor.transcribe(audio)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((audio, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: list[tuple[Any, asyncio.Future]]):
+        try:
+            if len(batch) == 1:
+                # A lone request gets exactly what an unbatched one would
+                results = [await self.executor.transcribe(batch[0][0])]
+            else:
+                results = await self.executor.transcribe_batch([audio for audio, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+SCHEDULER = BatchScheduler(EXECUTOR, BATCH_SIZE, BATCH_WINDOW_MS)
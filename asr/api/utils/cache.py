@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from fastapi import UploadFile
+
+from api.models import CacheStats, TranscriptionResponse
+from common.metrics.metrics import CallbackCounter, Gauge
+from constants import CACHE_DIR, CACHE_DIR_MAX_BYTES, CACHE_MAX_BYTES, COMPUTE_TYPE, ENGINE, MODEL_NAME
+
+CHUNK_SIZE = 1 << 16
+
+
+async def hash_upload(file: UploadFile) -> str:
+    """Content hash of an upload, the file is rewound afterwards"""
+    digest = hashlib.sha256()
+    while chunk := await file.read(CHUNK_SIZE):
+        digest.update(chunk)
+    await file.seek(0)
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """
+    Content-addressed cache of transcription results.
+
+    Results are keyed by the hash of the audio bytes, the engine and model
+    name and the transcription options. The memory tier is an LRU bounded by the total size
+    of the cached responses; the optional disk tier keeps one JSON file per
+    key, survives restarts and is bounded by `max_disk_bytes`, removing the
+    least recently used files. Concurrent requests for the same key share one
+    transcription.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_bytes: int,
+        directory: str | None = None,
+        max_disk_bytes: int = 0,
+    ):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.directory = directory or None
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[TranscriptionResponse, int]] = OrderedDict()
+        self._size = 0
+        self._inflight: dict[str, asyncio.Future] = {}
+        # Disk writes run in threads
+        self._disk_lock = threading.Lock()
+        self._disk_size = 0
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._disk_size = sum(size for _, size, _ in self._disk_entries())
+
+    def key(self, audio_hash: str, **options) -> str:
+        payload = json.dumps(
+            {"model": self.model_name, "options": options, "audio": audio_hash},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        assert self.directory is not None
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _disk_entries(self) -> list[tuple[str, int, float]]:
+        """(path, size, last use) of the cached files"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _read_disk(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = f.read()
+            # The modification time marks the last use for the eviction
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, data: str):
+        path = self._path(key)
+        # Write to a temporary file first so readers never see partial entries
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data)
+        size = os.path.getsize(temp_path)
+        with self._disk_lock:
+            try:
+                self._disk_size -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(temp_path, path)
+            self._disk_size += size
+            if self.max_disk_bytes > 0 and self._disk_size > self.max_disk_bytes:
+                self._trim_disk()
+
+    def _trim_disk(self):
+        """Removes the least recently used files until the tier fits its limit again"""
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        self._disk_size = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self._disk_size <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._disk_size -= size
+
+    def _remember(self, key: str, response: TranscriptionResponse, size: int):
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._size -= self._entries.pop(key)[1]
+        self._entries[key] = (response, size)
+        self._size += size
+        while self._size > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+
+    async def get(self, key: str) -> TranscriptionResponse | None:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+        if self.directory:
+            data = await asyncio.to_thread(self._read_disk, key)
+            if data is not None:
+                response = TranscriptionResponse.model_validate_json(data)
+                self._remember(key, response, len(data))
+                self.hits += 1
+                self.disk_hits += 1
+                return response
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, response: TranscriptionResponse):
+        data = response.model_dump_json()
+        self._remember(key, response, len(data))
+        if self.directory:
+            await asyncio.to_thread(self._write_disk, key, data)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[TranscriptionResponse]],
+    ) -> TranscriptionResponse:
+        cached = await self.get(key)
+        if cached is not None:
+            return cached
+        while (inflight := self._inflight.get(key)) is not None:
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if not inflight.cancelled() or (task is not None and task.cancelling()):
+                    raise
+                # The request computing the result went away, this one takes over
+                # with its own upload
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await compute()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # waiters are optional, don't log it as unretrieved
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(response)
+        await self.put(key, response)
+        return response
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            hits=self.hits,
+            disk_hits=self.disk_hits,
+            misses=self.misses,
+            entries=len(self._entries),
+            size_bytes=self._size,
+            max_bytes=self.max_bytes,
+        )
+
+
+CACHE = TranscriptionCache(
+    f"{ENGINE}:{COMPUTE_TYPE}:{MODEL_NAME}" if ENGINE == "faster-whisper" else f"{ENGINE}:{MODEL_NAME}",
+    CACHE_MAX_BYTES,
+    CACHE_DIR,
+    CACHE_DIR_MAX_BYTES,
+)
+
+
+CallbackCounter("asr_cache_hits_total", "Transcriptions served from the cache", lambda: CACHE.hits)
+CallbackCounter("asr_cache_misses_total", "Transcriptions not found in the cache", lambda: CACHE.misses)
+Gauge("asr_cache_size_bytes", "Size of the in-memory transcription cache", lambda: CACHE.stats().size_bytes)
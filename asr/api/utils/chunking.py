@@ -0,0 +1,69 @@
+import asyncio
+from collections import Counter
+
+import numpy as np
+
+from api.utils.audio import SAMPLE_RATE
+from api.utils.executor import InferenceExecutor
+
+# Energy frame for the silence detector, 30 ms
+FRAME = int(0.03 * SAMPLE_RATE)
+# Frames averaged together, so a sustained pause wins over a single quiet frame
+SMOOTHING = 10
+
+
+def split_on_silence(audio: np.ndarray, chunk_s: float, search_s: float = 10.0) -> list[tuple[int, int]]:
+    """
+    Split audio into chunks of at most `chunk_s` seconds, cutting each chunk
+    at the quietest moment of its last `search_s` seconds. Returns the
+    (start, end) sample bounds of the chunks.
+    """
+    chunk = int(chunk_s * SAMPLE_RATE)
+    search = int(min(search_s, chunk_s / 2) * SAMPLE_RATE)
+    bounds = []
+    start = 0
+    while len(audio) - start > chunk:
+        low = start + chunk - search
+        region = audio[low:start + chunk]
+        frames = len(region) // FRAME
+        energy = np.square(region[:frames * FRAME].reshape(frames, FRAME)).mean(axis=1)
+        energy = np.convolve(energy, np.ones(SMOOTHING) / SMOOTHING, mode="same")
+        cut = low + int(np.argmin(energy)) * FRAME + FRAME // 2
+        bounds.append((start, cut))
+        start = cut
+    bounds.append((start, len(audio)))
+    return bounds
+
+
+def stitch(results: list[dict], bounds: list[tuple[int, int]]) -> dict:
+    """Merge chunk results into one, shifting segment timestamps to the global timeline"""
+    segments = []
+    languages: Counter = Counter()
+    for result, (start, end) in zip(results, bounds):
+        offset = start / SAMPLE_RATE
+        for segment in result.get("segments") or []:
+            segments.append({
+                **segment,
+                "id": len(segments),
+                "start": offset + segment["start"],
+                "end": offset + segment["end"],
+            })
+        if isinstance(result.get("language"), str):
+            languages[result["language"]] += end - start
+    return {
+        "text": " ".join(
+            text for result in results if (text := result.get("text", "").strip())
+        ),
+        "language": languages.most_common(1)[0][0] if languages else None,
+        "segments": segments,
+    }
+
+
+async def transcribe_long(executor: InferenceExecutor, audio: np.ndarray, chunk_s: float) -> dict:
+    """Transcribe long audio as silence-separated chunks spread across the workers"""
+    bounds = split_on_silence(audio, chunk_s)
+    results = await asyncio.gather(*(
+        executor.transcribe(audio[start:end])
+        for start, end in bounds
+    ))
+    return stitch(list(results), bounds)
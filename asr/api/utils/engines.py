@@ -0,0 +1,184 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from api.utils.audio import SAMPLE_RATE
+
+# Samples in one 30 s Whisper window
+N_SAMPLES = 30 * SAMPLE_RATE
+
+# Defaults of `whisper.transcribe`: a window decoded with a compression ratio
+# or an average log probability past these is decoded again at a higher
+# temperature, unless it is judged to be silence
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+class Engine(ABC):
+    """
+    Speech recognition backend living in an inference worker.
+
+    Results follow the dict layout of `whisper.transcribe`: `text`,
+    `language` and `segments` with `start`, `end` and `text`.
+    """
+
+    @abstractmethod
+    def transcribe(self, audio: np.ndarray, **options) -> dict:
+        ...
+
+    def transcribe_batch(self, items: list[np.ndarray]) -> list:
+        """Transcribe several audios, returns a result or an exception per item"""
+        results: list = []
+        for audio in items:
+            try:
+                results.append(self.transcribe(audio))
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+def _to_plain_linear(module):
+    """
+    Replaces whisper's own `Linear` layers with `nn.Linear` sharing their weights.
+    `quantize_dynamic` matches modules by exact type and skips the subclass
+    """
+    import torch
+    import whisper.model
+
+    for name, child in module.named_children():
+        if type(child) is whisper.model.Linear:
+            linear = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+            linear.weight = child.weight
+            linear.bias = child.bias
+            setattr(module, name, linear)
+        else:
+            _to_plain_linear(child)
+
+
+class WhisperEngine(Engine):
+    """
+    Reference PyTorch implementation of openai-whisper. With `quantize` the
+    linear layers are dynamically quantized to int8, which speeds up CPU
+    inference at a small accuracy cost.
+    """
+
+    def __init__(self, model_name: str, threads: int, quantize: bool = False):
+        import torch
+        import whisper
+
+        # Split the cores between the workers instead of letting every
+        # process spin up a full-size torch thread pool
+        torch.set_num_threads(threads)
+        self.model = whisper.load_model(model_name, device="cpu" if quantize else None)
+        if quantize:
+            _to_plain_linear(self.model)
+            self.model = torch.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+
+    def transcribe(self, audio: np.ndarray, **options) -> dict:
+        options.setdefault("fp16", self.model.device.type == "cuda")
+        return self.model.transcribe(audio, **options)
+
+    def transcribe_batch(self, items: list[np.ndarray]) -> list:
+        """
+        Audios that fit into one 30 s Whisper window are padded into one
+        batched mel-spectrogram tensor and decoded together at temperature 0,
+        longer ones and lone short ones go through the regular `transcribe`.
+        Batched results that `transcribe` would have retried at a higher
+        temperature (repetition loops, low confidence) are transcribed again
+        with it.
+        """
+        import torch
+        import whisper
+
+        short = [i for i, audio in enumerate(items) if audio.shape[-1] <= N_SAMPLES]
+        if len(short) < 2:
+            return super().transcribe_batch(items)
+
+        results: list = [None] * len(items)
+        mel = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(items[i]), self.model.dims.n_mels)
+            for i in short
+        ]).to(self.model.device)
+        options = whisper.DecodingOptions(fp16=self.model.device.type == "cuda")
+        decoded = whisper.decode(self.model, mel, options)
+        for i, result in zip(short, decoded):  # type: ignore
+            # Same silence heuristic and fallback criteria as `transcribe`
+            # uses for its windows, with its default thresholds
+            silent = result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD
+            if not silent and (
+                result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+                or result.avg_logprob < LOGPROB_THRESHOLD
+            ):
+                continue
+            text = "" if silent else result.text
+            duration = items[i].shape[-1] / SAMPLE_RATE
+            results[i] = {
+                "text": text,
+                "language": result.language,
+                "segments": [{
+                    "id": 0,
+                    "start": 0.0,
+                    "end": float(duration),
+                    "text": text,
+                    "avg_logprob": result.avg_logprob,
+                    "no_speech_prob": result.no_speech_prob,
+                }] if text else [],
+            }
+
+        for i, audio in enumerate(items):
+            if results[i] is None:
+                try:
+                    results[i] = self.transcribe(audio)
+                except Exception as e:
+                    results[i] = e
+        return results
+
+
+class FasterWhisperEngine(Engine):
+    """CTranslate2 implementation of Whisper (faster-whisper), int8 on CPU by default"""
+
+    def __init__(self, model_name: str, threads: int, compute_type: str = "int8"):
+        from faster_whisper import WhisperModel
+
+        self.model = WhisperModel(
+            model_name,
+            device="cpu",
+            compute_type=compute_type,
+            cpu_threads=threads,
+        )
+
+    def transcribe(self, audio: np.ndarray, **options) -> dict:
+        segments, info = self.model.transcribe(audio, **options)
+        # `segments` is lazy, decoding happens while iterating
+        result_segments = [
+            {
+                "id": segment.id,
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "avg_logprob": segment.avg_logprob,
+                "no_speech_prob": segment.no_speech_prob,
+            }
+            for segment in segments
+        ]
+        return {
+            "text": "".join(segment["text"] for segment in result_segments),
+            "language": info.language,
+            "segments": result_segments,
+        }
+
+
+ENGINES = ("whisper", "whisper-int8", "faster-whisper")
+
+
+def create_engine(engine: str, model_name: str, threads: int, compute_type: str = "int8") -> Engine:
+    if engine == "whisper":
+        return WhisperEngine(model_name, threads)
+    if engine == "whisper-int8":
+        return WhisperEngine(model_name, threads, quantize=True)
+    if engine == "faster-whisper":
+        return FasterWhisperEngine(model_name, threads, compute_type)
+    raise ValueError(f"Unknown ASR engine {engine!r}, expected one of {', '.join(ENGINES)}")
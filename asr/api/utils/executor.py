@@ -0,0 +1,276 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+import numpy as np
+
+from api.utils.audio import SAMPLE_RATE
+from api.utils.engines import ENGINES, Engine, create_engine
+from common.metrics.metrics import Counter, Gauge, Histogram
+from constants import COMPUTE_TYPE, ENGINE, MODEL_NAME, QUEUE_SIZE, SJF_FACTOR, WORKERS
+
+INFERENCE_SECONDS = Histogram(
+    "asr_inference_seconds",
+    "Time spent by a worker on a transcription job",
+    ("job",),
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "asr_queue_wait_seconds",
+    "Time a transcription job waited for a free worker",
+)
+AUDIO_SECONDS = Counter(
+    "asr_audio_seconds_total",
+    "Seconds of audio processed by the workers",
+)
+INFERENCE_ERRORS = Counter(
+    "asr_inference_errors_total",
+    "Transcription jobs that failed in a worker",
+    ("job",),
+)
+POOL_REBUILDS = Counter(
+    "asr_pool_rebuilds_total",
+    "Worker pools rebuilt after a worker process died",
+)
+
+# Engine of the current worker process, set by `_init_worker`
+_ENGINE: Engine | None = None
+
+
+def _init_worker(engine: str, model_name: str, threads: int, compute_type: str):
+    global _ENGINE
+    _ENGINE = create_engine(engine, model_name, threads, compute_type)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _transcribe(audio: Any, options: dict) -> dict:
+    if _ENGINE is None:
+        raise RuntimeError("ENGINE NOT LOADED")
+    return _ENGINE.transcribe(audio, **options)
+
+
+def _transcribe_batch(items: list) -> list:
+    if _ENGINE is None:
+        raise RuntimeError("ENGINE NOT LOADED")
+    return _ENGINE.transcribe_batch(items)
+
+
+class InferenceExecutor:
+    """
+    Runs speech recognition in a pool of worker processes, each holding its
+    own engine instance.
+
+    Jobs are fed to the pool through a bounded queue: at most `workers` jobs
+    are executing at any time, up to `queue_size` more wait for a free worker
+    and callers beyond that are suspended until a slot frees up. The event
+    loop itself never runs inference, so the HTTP layer stays responsive.
+
+    Waiting jobs are ordered shortest-job-first: a job's priority is its
+    arrival time plus its cost (seconds of audio, for a batch decoded in one
+    pass the length of its longest item) times `sjf_factor`, so
+    short jobs overtake long ones, while a long job that has waited for
+    `sjf_factor` times its length can't be overtaken anymore and never starves.
+
+    If a worker process dies (OOM, a crash in native code) the whole pool is
+    broken: the jobs that were running on it fail, and the pool is replaced
+    with a fresh one before the waiting jobs are dispatched.
+    """
+
+    def __init__(
+        self,
+        engine: str,
+        model_name: str,
+        workers: int,
+        queue_size: int,
+        compute_type: str = "int8",
+        sjf_factor: float = 10.0,
+    ):
+        self.engine = engine
+        self.model_name = model_name
+        self.compute_type = compute_type
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.sjf_factor = sjf_factor
+        # Moving average of processing seconds per second of audio
+        self.rtf = 1.0
+        self._pool: ProcessPoolExecutor | None = None
+        self._queue: asyncio.PriorityQueue | None = None
+        self._dispatchers: list[asyncio.Task] = []
+        self._sequence = itertools.count()
+        # (priority, cost) of every job waiting for a worker
+        self._waiting: dict[int, tuple[float, float]] = {}
+        self._running_cost = 0.0
+        self._running = 0
+        self.pids: set[int] = set()
+        # "ok", "rebuilding" after a worker died, "broken" if the rebuild failed
+        self.pool_state = "ok"
+        self._pool_ready = asyncio.Event()
+        self._rebuild_lock = asyncio.Lock()
+
+    async def _start_pool(self):
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.engine, self.model_name, threads, self.compute_type),
+        )
+        loop = asyncio.get_running_loop()
+        # Spawn every worker and wait for the engines to load before
+        # accepting requests
+        self.pids = set(await asyncio.gather(*(
+            loop.run_in_executor(self._pool, _ping)
+            for _ in range(self.workers)
+        )))
+
+    async def start(self):
+        if self.engine not in ENGINES:
+            raise ValueError(f"Unknown ASR engine {self.engine!r}, expected one of {', '.join(ENGINES)}")
+        await self._start_pool()
+        self.pool_state = "ok"
+        self._pool_ready.set()
+        self._queue = asyncio.PriorityQueue(maxsize=self.queue_size)
+        self._dispatchers = [
+            asyncio.create_task(self._dispatch())
+            for _ in range(self.workers)
+        ]
+
+    async def shutdown(self):
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._dispatchers = []
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def _rebuild(self, broken: ProcessPoolExecutor):
+        """Replace the pool `broken` once, however many dispatchers saw it fail"""
+        async with self._rebuild_lock:
+            if self._pool is not broken:
+                return
+            self.pool_state = "rebuilding"
+            self._pool_ready.clear()
+            POOL_REBUILDS.inc()
+            broken.shutdown(wait=False, cancel_futures=True)
+            try:
+                await self._start_pool()
+            except Exception:
+                # Jobs keep failing fast, and every failure retries the rebuild
+                self.pool_state = "broken"
+            else:
+                self.pool_state = "ok"
+            finally:
+                self._pool_ready.set()
+
+    async def _dispatch(self):
+        assert self._queue is not None
+        loop = asyncio.get_running_loop()
+        while True:
+            _, sequence, fn, args, cost, audio_s, enqueued, future = await self._queue.get()
+            self._waiting.pop(sequence, None)
+            job = fn.__name__.lstrip("_")
+            try:
+                if future.done():
+                    # The caller went away while the job was queued
+                    continue
+                await self._pool_ready.wait()
+                QUEUE_WAIT_SECONDS.observe(time.monotonic() - enqueued)
+                self._running += 1
+                self._running_cost += cost
+                started = time.perf_counter()
+                pool = self._pool
+                try:
+                    result = await loop.run_in_executor(pool, fn, *args)
+                finally:
+                    self._running -= 1
+                    self._running_cost -= cost
+                elapsed = time.perf_counter() - started
+                INFERENCE_SECONDS.observe(elapsed, job=job)
+                AUDIO_SECONDS.inc(audio_s)
+                if cost > 0:
+                    self.rtf = 0.8 * self.rtf + 0.2 * elapsed / cost
+            except Exception as e:
+                INFERENCE_ERRORS.inc(job=job)
+                if not future.done():
+                    future.set_exception(e)
+                if isinstance(e, BrokenProcessPool):
+                    # Only the jobs that were running fail, the waiting ones
+                    # get the new pool
+                    await self._rebuild(pool)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self._queue.task_done()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiting)
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def queued_cost(self) -> float:
+        return sum(cost for _, cost in self._waiting.values())
+
+    def estimate_wait(self, cost: float) -> float:
+        """Seconds a new job of `cost` would wait for a worker"""
+        priority = time.monotonic() + cost * self.sjf_factor
+        ahead = sum(c for p, c in self._waiting.values() if p <= priority)
+        return (ahead + self._running_cost) * self.rtf / self.workers
+
+    async def submit(self, fn: Callable, *args, cost: float = 0.0, audio_s: float | None = None) -> Any:
+        """
+        Run a picklable top-level function in a worker process. `cost` orders
+        the queue and estimates the processing time, `audio_s` is the audio the
+        job transcribes, `cost` by default
+        """
+        if self._queue is None:
+            raise RuntimeError("EXECUTOR NOT STARTED")
+        future = asyncio.get_running_loop().create_future()
+        enqueued = time.monotonic()
+        priority = enqueued + cost * self.sjf_factor
+        sequence = next(self._sequence)
+        self._waiting[sequence] = (priority, cost)
+        try:
+            await self._queue.put((
+                priority, sequence, fn, args, cost,
+                cost if audio_s is None else audio_s, enqueued, future
+            ))
+        except BaseException:
+            self._waiting.pop(sequence, None)
+            raise
+        return await future
+
+    async def transcribe(self, audio: np.ndarray, **options) -> dict:
+        return await self.submit(_transcribe, audio, options, cost=audio_duration(audio))
+
+    async def transcribe_batch(self, items: list[np.ndarray]) -> list:
+        durations = [audio_duration(audio) for audio in items]
+        # The items are decoded together, the batch takes about as long as its longest item
+        return await self.submit(
+            _transcribe_batch, items,
+            cost=max(durations, default=0.0), audio_s=sum(durations)
+        )
+
+
+def audio_duration(audio: np.ndarray) -> float:
+    return audio.shape[-1] / SAMPLE_RATE
+
+
+EXECUTOR = InferenceExecutor(ENGINE, MODEL_NAME, WORKERS, QUEUE_SIZE, COMPUTE_TYPE, SJF_FACTOR)
+
+Gauge("asr_queue_depth", "Transcription jobs waiting for a worker", lambda: EXECUTOR.queue_depth)
+Gauge("asr_running_jobs", "Transcription jobs being processed by the workers", lambda: EXECUTOR.running)
+Gauge("asr_rtf", "Moving average of the real-time factor", lambda: EXECUTOR.rtf)
+Gauge("asr_pool_healthy", "1 while the worker pool can run jobs", lambda: int(EXECUTOR.pool_state == "ok"))
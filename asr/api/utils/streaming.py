@@ -0,0 +1,78 @@
+import numpy as np
+
+from api.utils.audio import SAMPLE_RATE
+from api.utils.executor import InferenceExecutor
+
+
+class StreamTranscriber:
+    """
+    Transcribes a growing audio buffer window by window.
+
+    Once a full window is buffered it is transcribed in a worker, and all
+    segments but the last are committed. The last segment may be cut in the
+    middle of a word, so its audio is carried over to the start of the next
+    window. Committed segments get timestamps relative to the whole stream.
+    """
+
+    def __init__(self, executor: InferenceExecutor, window_s: float):
+        self.executor = executor
+        self.window_samples = int(window_s * SAMPLE_RATE)
+        self.language: str | None = None
+        self.segments: list[dict] = []
+        self._buffer = np.empty(0, dtype=np.float32)
+        # Stream time of the first buffered sample, in samples
+        self._offset = 0
+
+    @property
+    def duration(self) -> float:
+        return (self._offset + len(self._buffer)) / SAMPLE_RATE
+
+    @property
+    def text(self) -> str:
+        return " ".join(segment["text"] for segment in self.segments if segment["text"])
+
+    def feed(self, samples: np.ndarray):
+        self._buffer = np.concatenate((self._buffer, samples))
+
+    def ready(self, final: bool = False) -> bool:
+        if final:
+            return len(self._buffer) > 0
+        return len(self._buffer) >= self.window_samples
+
+    async def step(self, final: bool = False) -> list[dict]:
+        """Transcribe the next window and return the newly committed segments"""
+        window = self._buffer[:self.window_samples]
+        is_last = final and len(self._buffer) <= self.window_samples
+
+        options: dict = {"condition_on_previous_text": False}
+        if self.language:
+            options["language"] = self.language
+        if self.segments:
+            # Give the decoder the tail of the committed text as context
+            options["initial_prompt"] = self.text[-200:]
+        result = await self.executor.transcribe(window, **options)
+        if self.language is None and isinstance(result.get("language"), str):
+            self.language = result["language"]
+
+        segments = result.get("segments") or []
+        consumed = len(window)
+        if not is_last and len(segments) > 1:
+            carry_from = int(segments[-1]["start"] * SAMPLE_RATE)
+            if 0 < carry_from < len(window):
+                segments = segments[:-1]
+                consumed = carry_from
+
+        offset = self._offset / SAMPLE_RATE
+        committed = [
+            {
+                "text": segment["text"].strip(),
+                "start": round(offset + segment["start"], 3),
+                "end": round(offset + min(segment["end"], consumed / SAMPLE_RATE), 3),
+                "language": self.language,
+            }
+            for segment in segments
+        ]
+        self.segments.extend(committed)
+        self._buffer = self._buffer[consumed:]
+        self._offset += consumed
+        return committed
@@ -0,0 +1,193 @@
+"""
+Offline benchmark of the transcription pipeline.
+
+Runs the same path as `/transcribe` (inference workers, micro-batching and
+parallel long-audio chunking) for every combination of engine, model size,
+audio length and concurrency, without the HTTP layer or the result cache.
+
+Example:
+    python benchmark.py --engines whisper,faster-whisper --models tiny,small \
+        --lengths 5,20,300 --concurrency 1,8 --output benchmark.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from api.utils.audio import SAMPLE_RATE, decode_native
+from api.utils.batching import BatchScheduler
+from api.utils.chunking import transcribe_long
+from api.utils.engines import N_SAMPLES
+from api.utils.executor import INFERENCE_SECONDS, InferenceExecutor
+from constants import BATCH_SIZE, BATCH_WINDOW_MS, CHUNK_S, COMPUTE_TYPE, LONG_AUDIO_S, WORKERS
+
+
+def synthetic_audio(seconds: float, seed: int = 0) -> np.ndarray:
+    """Speech-like signal: noise bursts with a syllable-rate envelope and pauses"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) * (np.sin(2 * np.pi * 0.2 * t) > -0.3)
+    voice = np.sin(2 * np.pi * 150 * t) + 0.5 * np.sin(2 * np.pi * 300 * t)
+    noise = rng.normal(0, 0.3, len(t))
+    return (0.3 * envelope * (voice + noise)).astype(np.float32)
+
+
+def fixture_audio(path: str, seconds: float) -> np.ndarray:
+    """Fixture cropped or tiled to the requested length"""
+    with open(path, "rb") as f:
+        audio = decode_native(f.read())
+    samples = int(seconds * SAMPLE_RATE)
+    return np.resize(audio, samples).astype(np.float32)
+
+
+def percentile(values: list[float], q: float) -> float:
+    return round(float(np.percentile(values, q)), 3)
+
+
+def peak_rss_mb(pids: set[int]) -> float | None:
+    """Sum of the peak resident set sizes of the main process and the workers"""
+    total_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            return None
+    return round(total_kb / 1024, 1)
+
+
+async def transcribe(executor: InferenceExecutor, scheduler: BatchScheduler, audio: np.ndarray) -> dict:
+    # Same dispatch as the /transcribe route
+    if executor.workers > 1 and len(audio) > LONG_AUDIO_S * SAMPLE_RATE:
+        return await transcribe_long(executor, audio, CHUNK_S)
+    if len(audio) <= N_SAMPLES:
+        return await scheduler.transcribe(audio)
+    return await executor.transcribe(audio)
+
+
+async def run_level(
+    executor: InferenceExecutor,
+    scheduler: BatchScheduler,
+    audio: np.ndarray,
+    concurrency: int,
+    requests: int,
+) -> dict:
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await transcribe(executor, scheduler, audio)
+            latencies.append(time.perf_counter() - started)
+
+    processing_before = INFERENCE_SECONDS.sum()
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    wall = time.perf_counter() - started
+    processing = INFERENCE_SECONDS.sum() - processing_before
+    audio_s = len(audio) / SAMPLE_RATE
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "latency_p50_s": percentile(latencies, 50),
+        "latency_p90_s": percentile(latencies, 90),
+        "latency_p99_s": percentile(latencies, 99),
+        "latency_max_s": round(max(latencies), 3),
+        "throughput_audio_s_per_s": round(audio_s * requests / wall, 3),
+        # Worker processing time per second of audio, without queueing
+        "rtf": round(processing / (audio_s * requests), 4),
+        # Latency seen by a client per second of audio, grows with the queue
+        "latency_rtf": round(float(np.mean(latencies)) / audio_s, 4),
+        "wall_s": round(wall, 3),
+    }
+
+
+async def run_engine(args: argparse.Namespace, engine: str, model: str) -> dict:
+    executor = InferenceExecutor(engine, model, args.workers, args.queue_size, args.compute_type)
+    scheduler = BatchScheduler(executor, args.batch_size, args.batch_window_ms)
+    started = time.perf_counter()
+    await executor.start()
+    load_s = time.perf_counter() - started
+    results = []
+    try:
+        for length in args.lengths:
+            audio = fixture_audio(args.audio, length) if args.audio else synthetic_audio(length)
+            # Warm up caches and lazy initialization outside of the measurement
+            await transcribe(executor, scheduler, audio)
+            for concurrency in args.concurrency:
+                level = await run_level(executor, scheduler, audio, concurrency, max(args.requests, concurrency))
+                results.append({"audio_s": length, **level})
+                print(f"{engine}/{model} {length}s x{concurrency}: "
+                      f"p50={level['latency_p50_s']}s rtf={level['rtf']} latency_rtf={level['latency_rtf']} "
+                      f"throughput={level['throughput_audio_s_per_s']} audio-s/s", flush=True)
+        peak_rss = peak_rss_mb(executor.pids)
+    finally:
+        await executor.shutdown()
+    return {
+        "engine": engine,
+        "model": model,
+        "model_load_s": round(load_s, 3),
+        "peak_rss_mb": peak_rss,
+        "results": results,
+    }
+
+
+def csv(cast):
+    return lambda value: [cast(item) for item in value.split(",") if item]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ASR transcription pipeline")
+    parser.add_argument("--engines", type=csv(str), default=["whisper"])
+    parser.add_argument("--models", type=csv(str), default=["small"])
+    parser.add_argument("--lengths", type=csv(float), default=[5.0, 20.0, 180.0], help="audio lengths, seconds")
+    parser.add_argument("--concurrency", type=csv(int), default=[1, 4])
+    parser.add_argument("--requests", type=int, default=8, help="requests per concurrency level")
+    parser.add_argument("--audio", help="fixture audio file (wav/ogg/mp3/flac), synthetic audio if omitted")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--queue-size", type=int, default=1024)
+    parser.add_argument("--compute-type", default=COMPUTE_TYPE)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW_MS)
+    parser.add_argument("--output", default="benchmark.json", help="where to save the JSON report")
+    args = parser.parse_args()
+
+    runs = []
+    for engine in args.engines:
+        for model in args.models:
+            runs.append(await run_engine(args, engine, model))
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "settings": {
+            "workers": args.workers,
+            "batch_size": args.batch_size,
+            "batch_window_ms": args.batch_window_ms,
+            "compute_type": args.compute_type,
+            "long_audio_s": LONG_AUDIO_S,
+            "chunk_s": CHUNK_S,
+            "audio": args.audio or "synthetic",
+        },
+        "runs": runs,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved report to {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
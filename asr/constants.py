@@ -1,3 +1,38 @@
-import whisper
+import os
 
-MODEL = whisper.load_model("small")
+# Recognition backend: whisper, whisper-int8 or faster-whisper
+ENGINE = os.getenv("ASR_ENGINE", "whisper")
+MODEL_NAME = os.getenv("ASR_MODEL", "small")
+# CTranslate2 compute type of the faster-whisper engine
+COMPUTE_TYPE = os.getenv("ASR_COMPUTE_TYPE", "int8")
+
+# Number of inference worker processes, each holding its own copy of the model
+WORKERS = int(os.getenv("ASR_WORKERS", "1"))
+# Maximum number of transcription jobs waiting for a free worker
+QUEUE_SIZE = int(os.getenv("ASR_QUEUE_SIZE", "64"))
+# How strongly short jobs are preferred: a job waits for at most this many
+# times its audio length before shorter jobs stop overtaking it
+SJF_FACTOR = float(os.getenv("ASR_SJF_FACTOR", "10"))
+# Requests are rejected with 429 when their estimated wait exceeds this, in seconds
+MAX_WAIT_S = float(os.getenv("ASR_MAX_WAIT_S", "120"))
+
+# Maximum number of requests decoded together in one batch, 1 disables batching
+BATCH_SIZE = int(os.getenv("ASR_BATCH_SIZE", "8"))
+# How long the first request of a batch waits for others to join, in milliseconds
+BATCH_WINDOW_MS = float(os.getenv("ASR_BATCH_WINDOW_MS", "20"))
+
+# Default length of the audio windows decoded by the streaming endpoint, in seconds
+STREAM_WINDOW_S = float(os.getenv("ASR_STREAM_WINDOW_S", "30"))
+
+# Audio longer than this, in seconds, is split at silences and its chunks are
+# transcribed in parallel when there is more than one worker
+LONG_AUDIO_S = float(os.getenv("ASR_LONG_AUDIO_S", "120"))
+# Target chunk length for long audio, in seconds
+CHUNK_S = float(os.getenv("ASR_CHUNK_S", "120"))
+
+# Memory budget of the in-memory transcription cache, in bytes, 0 disables it
+CACHE_MAX_BYTES = int(os.getenv("ASR_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Directory of the persistent cache tier, empty disables it
+CACHE_DIR = os.getenv("ASR_CACHE_DIR", "")
+# Size limit of the persistent cache tier, in bytes, least recently used entries are removed
+CACHE_DIR_MAX_BYTES = int(os.getenv("ASR_CACHE_DIR_MAX_BYTES", str(1024 * 1024 * 1024)))
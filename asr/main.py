@@ -3,11 +3,20 @@ from fastapi import FastAPI
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    from api.routes import asr_router
+    from api.routes import asr_router, asr_stream_router
+    from api.utils.executor import EXECUTOR
+    from common.auth.auth import token_store
     from common.auth.router import auth_router
+    from common.metrics.router import metrics_router
     app.include_router(asr_router)
+    app.include_router(asr_stream_router)
     app.include_router(auth_router)
+    app.include_router(metrics_router)
+    await token_store.start()
+    await EXECUTOR.start()
     yield
+    await EXECUTOR.shutdown()
+    await token_store.stop()
 
 # Initialize FastAPI app
 app = FastAPI(
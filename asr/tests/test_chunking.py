@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from api.utils.audio import SAMPLE_RATE
+from api.utils.chunking import split_on_silence, stitch
+
+
+def _noise(seconds: float, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).uniform(-0.5, 0.5, int(seconds * SAMPLE_RATE)).astype(np.float32)
+
+
+def test_short_audio_is_one_chunk():
+    audio = _noise(20)
+
+    assert split_on_silence(audio, chunk_s=30) == [(0, len(audio))]
+
+
+def test_chunks_cover_audio_without_gaps():
+    audio = _noise(95)
+    bounds = split_on_silence(audio, chunk_s=30, search_s=5)
+
+    assert bounds[0][0] == 0
+    assert bounds[-1][1] == len(audio)
+    for (_, end), (start, _) in zip(bounds, bounds[1:]):
+        assert end == start
+    for start, end in bounds:
+        assert 0 < end - start <= 30 * SAMPLE_RATE
+
+
+def test_cut_lands_in_silence():
+    audio = _noise(50)
+    silence = slice(27 * SAMPLE_RATE, 28 * SAMPLE_RATE)
+    audio[silence] = 0
+    bounds = split_on_silence(audio, chunk_s=30, search_s=10)
+
+    assert len(bounds) == 2
+    assert silence.start <= bounds[0][1] < silence.stop
+
+
+def test_stitch_shifts_timestamps():
+    bounds = [(0, 30 * SAMPLE_RATE), (30 * SAMPLE_RATE, 45 * SAMPLE_RATE)]
+    results = [
+        {"text": " first ", "language": "ru", "segments": [
+            {"id": 0, "start": 0.0, "end": 12.5, "text": "a"},
+            {"id": 1, "start": 12.5, "end": 29.0, "text": "b"},
+        ]},
+        {"text": "second", "language": "en", "segments": [
+            {"id": 0, "start": 1.0, "end": 14.0, "text": "c"},
+        ]},
+    ]
+    merged = stitch(results, bounds)
+
+    assert merged["text"] == "first second"
+    assert [segment["id"] for segment in merged["segments"]] == [0, 1, 2]
+    assert [segment["text"] for segment in merged["segments"]] == ["a", "b", "c"]
+    assert merged["segments"][2]["start"] == pytest.approx(31.0)
+    assert merged["segments"][2]["end"] == pytest.approx(44.0)
+    # Language of the longer chunk wins
+    assert merged["language"] == "ru"
+
+
+def test_stitch_skips_empty_chunks():
+    bounds = [(0, SAMPLE_RATE), (SAMPLE_RATE, 2 * SAMPLE_RATE)]
+    merged = stitch([{"text": "  ", "segments": None}, {"text": "word", "segments": []}], bounds)
+
+    assert merged == {"text": "word", "language": None, "segments": []}
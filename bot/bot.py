@@ -1,12 +1,14 @@
 import asyncio
+import time
 import uuid
 import os
-from typing import Dict
+from typing import Any, AsyncIterator, Dict
 
 from aiogram import Bot, Dispatcher, F
 from aiogram.types import (
     Message,
 )
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from dotenv import load_dotenv
 
@@ -25,6 +27,9 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 BASE_URL = os.getenv("BASE_URL")
 SECRET_TOKEN = os.getenv("SECRET_TOKEN")
 
+# Минимальный интервал между правками сообщения при потоковом ответе (лимиты Telegram)
+STREAM_EDIT_INTERVAL_S = 1.0
+
 bot = Bot(token=BOT_TOKEN)
 dp = Dispatcher()
 
@@ -67,6 +72,45 @@ async def download_voice(message: Message) -> bytes:
     return await bot.download_file(file.file_path)
 
 
+async def edit_answer(reply: Message, text: str):
+    """Редактирует сообщение; Telegram отклоняет правку, не меняющую видимый текст"""
+    try:
+        await reply.edit_text(text)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
+
+
+async def answer_stream(
+    message: Message,
+    events: AsyncIterator[Dict[str, Any]],
+    empty_answer: str,
+):
+    """Отправляет ответ по мере генерации, периодически редактируя одно сообщение"""
+    reply = await message.answer("⏳")
+    text = ""
+    shown = ""
+    last_edit = time.monotonic()
+
+    async for event in events:
+        if event["event"] != "token":
+            continue
+        text += event.get("content", "")
+        if (
+            text.strip()
+            and text.strip() != shown
+            and time.monotonic() - last_edit >= STREAM_EDIT_INTERVAL_S
+        ):
+            # Telegram показывает текст без пробелов по краям
+            shown = text.strip()
+            await edit_answer(reply, shown)
+            last_edit = time.monotonic()
+
+    text = text.strip() or empty_answer
+    if text != shown:
+        await edit_answer(reply, text)
+
+
 # -------------------- commands --------------------
 
 @dp.message(Command("start"))
@@ -129,13 +173,13 @@ async def handle_text(message: Message):
 
     picture = None
 
-    response = await llm_client.text_completion(
+    events = llm_client.text_completion_stream(
         dialog_id=dialog_id,
         query=message.text,
         picture=picture,
     )
 
-    await message.answer(response.get("content", "🤷 Нет ответа"))
+    await answer_stream(message, events, "🤷 Нет ответа")
 
 
 # -------------------- voice --------------------
@@ -149,13 +193,13 @@ async def handle_voice(message: Message):
 
     picture = None
 
-    response = await llm_client.audio_completion(
+    events = llm_client.audio_completion_stream(
         dialog_id=dialog_id,
         audio_data=audio_data,
         picture=picture,
     )
 
-    await message.answer(response.get("content", "🎤 Нет ответа"))
+    await answer_stream(message, events, "🎤 Нет ответа")
 
 
 # -------------------- document --------------------
@@ -1,6 +1,7 @@
 import aiohttp
+import json
 import uuid
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
 
 
 class LLMServiceClient:
@@ -142,6 +143,122 @@ class LLMServiceClient:
                 response.raise_for_status()
                 return await response.json()
     
+    async def text_completion_stream(
+        self,
+        dialog_id: uuid.UUID,
+        query: str = "",
+        picture: Optional[bytes] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Потоковая обработка текстового запроса
+        
+        Args:
+            dialog_id: UUID диалога
+            query: Текстовый запрос (по умолчанию пустая строка)
+            picture: Изображение в бинарном формате (опционально)
+            
+        Yields:
+            События ответа: {"event": "token", "content": ...} и {"event": "done"}
+        """
+        url = f"{self.base_url}/v1/chat/completion/text/stream"
+        
+        params = {
+            "dialog_id": str(dialog_id),
+            "query": query
+        }
+        
+        data = aiohttp.FormData()
+        
+        if picture:
+            data.add_field(
+                'picture',
+                picture,
+                filename='picture.jpg',
+                content_type='image/jpeg'
+            )
+        
+        async for event in self._stream(url, params, data):
+            yield event
+    
+    async def audio_completion_stream(
+        self,
+        dialog_id: uuid.UUID,
+        audio_data: bytes,
+        picture: Optional[bytes] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Потоковая обработка аудиозапроса
+        
+        Args:
+            dialog_id: UUID диалога
+            audio_data: Аудиофайл в бинарном формате
+            picture: Изображение в бинарном формате (опционально)
+            
+        Yields:
+            События ответа: {"event": "transcript", "text": ...},
+            {"event": "token", "content": ...} и {"event": "done"}
+        """
+        url = f"{self.base_url}/v1/chat/completion/audio/stream"
+        
+        params = {
+            "dialog_id": str(dialog_id)
+        }
+        
+        data = aiohttp.FormData()
+        
+        data.add_field(
+            'audio',
+            audio_data,
+            filename='audio.mp3',
+            content_type='audio/mpeg'
+        )
+        
+        if picture:
+            data.add_field(
+                'picture',
+                picture,
+                filename='picture.jpg',
+                content_type='image/jpeg'
+            )
+        
+        async for event in self._stream(url, params, data):
+            yield event
+    
+    async def _stream(
+        self,
+        url: str,
+        params: Dict[str, str],
+        data: aiohttp.FormData
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Чтение ответа в формате Server-Sent Events
+        
+        Args:
+            url: Адрес потокового эндпоинта
+            params: Параметры запроса
+            data: multipart данные запроса
+            
+        Yields:
+            Словарь с полем "event" и полями из data события
+        """
+        headers = {**self.headers, 'Accept': 'text/event-stream'}
+        
+        async with aiohttp.ClientSession(headers=headers) as session:
+            async with session.post(url, params=params, data=data) as response:
+                response.raise_for_status()
+                
+                event = "message"
+                async for raw_line in response.content:
+                    line = raw_line.decode("utf-8").rstrip("\r\n")
+                    if line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                    elif line.startswith("data:"):
+                        payload = json.loads(line[len("data:"):].strip() or "{}")
+                        yield {"event": event, **payload}
+                        if event == "done":
+                            return
+                        event = "message"
+    
     async def clear_chat(self, dialog_id: uuid.UUID) -> Dict[str, Any]:
         """
         Очистка истории чата
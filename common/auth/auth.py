@@ -1,8 +1,12 @@
-from datetime import datetime
-from fastapi import HTTPException, Depends, Request
+from fastapi import HTTPException, Depends, Request, WebSocket, WebSocketException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
-valid_tokens = []
+from common.auth.signing import TokenSigner
+from common.auth.store import TokenStore
+from common.constants import TOKEN_CACHE_SIZE, TOKEN_MODE, TOKEN_SIGNING_KEY, TOKEN_STORE_MAX_SIZE
+
+token_store = TokenStore(TOKEN_STORE_MAX_SIZE)
+token_signer = TokenSigner(TOKEN_SIGNING_KEY, TOKEN_CACHE_SIZE)
 
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer(auto_error=False))):
     """Get current user by checking the token in Authorization header or query parameter"""
@@ -17,21 +21,11 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(HTTPBea
 
     return token
 
-def verify_token(token: str, valid_tokens: list) -> bool:
+def verify_token(token: str, token_store: TokenStore) -> bool:
     """Check if the token is valid and not expired"""
-    # Remove expired tokens
-    current_time = datetime.now()
-    print("1", valid_tokens)
-    valid_tokens = [
-        t for t in valid_tokens 
-        if t.expires_at > current_time
-    ]
-    print("2", valid_tokens)
-    # Check if the token exists in valid_tokens
-    for token_data in valid_tokens:
-        if token_data.token == token:
-            return True
-    return False
+    if TOKEN_MODE == "signed":
+        return token_signer.verify(token)
+    return token_store.is_valid(token)
 
 def require_valid_token(request: Request, token: str = Depends(get_current_user)):
     """Dependency that checks for a valid token in header or query param"""
@@ -39,10 +33,24 @@ def require_valid_token(request: Request, token: str = Depends(get_current_user)
     if not token:
         token = request.query_params.get('token', "")
 
-    if not token or not verify_token(token, valid_tokens):
+    if not token or not verify_token(token, token_store):
         raise HTTPException(
             status_code=401,
             detail="Invalid or missing token",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return token
\ No newline at end of file
+    return token
+
+def require_valid_token_ws(websocket: WebSocket):
+    """Dependency that checks for a valid token of a WebSocket connection in header or query param"""
+    token = websocket.query_params.get('token', "")
+    authorization = websocket.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        token = authorization[len("bearer "):]
+
+    if not token or not verify_token(token, token_store):
+        raise WebSocketException(
+            code=status.WS_1008_POLICY_VIOLATION,
+            reason="Invalid or missing token",
+        )
+    return token
@@ -5,8 +5,8 @@ from fastapi import APIRouter, HTTPException
 from common.auth.models.requests import GenerateTokenRequest
 from common.auth.models.responses import GenerateTokenResponse
 from common.auth.tokendata import TokenData
-from common.constants import SECRET_TOKEN
-from common.auth.auth import valid_tokens
+from common.constants import SECRET_TOKEN, TOKEN_MODE
+from common.auth.auth import token_signer, token_store
 
 
 auth_router = APIRouter(tags=["AUTH"])
@@ -28,18 +28,21 @@ async def generate_token(request: GenerateTokenRequest):
     Raises:
         HTTPException: Если переданный секретный токен недействителен (код 401)
     """
-    global valid_tokens
     if request.secret_token != SECRET_TOKEN:
         raise HTTPException(status_code=401, detail="Invalid secret token")
 
-    # Generate a new token
-    access_token = secrets.token_urlsafe(32)
     expires_at = datetime.utcnow() + timedelta(hours=24)  # Token expires in 24 hours
 
-    # Store the token
-    token_data = TokenData(token=access_token, expires_at=expires_at)
-    valid_tokens.append(token_data)
-    print(valid_tokens)
+    if TOKEN_MODE == "signed":
+        # Stateless token, verified by its signature in any worker or replica
+        access_token = token_signer.issue(expires_at)
+    else:
+        # Generate a new token
+        access_token = secrets.token_urlsafe(32)
+
+        # Store the token
+        token_data = TokenData(token=access_token, expires_at=expires_at)
+        token_store.add(token_data)
     return GenerateTokenResponse(
         access_token=access_token,
         expires_at=expires_at.isoformat()
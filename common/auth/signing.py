@@ -0,0 +1,71 @@
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class TokenSigner:
+    """
+    Stateless access tokens: `<payload>.<signature>`, where the payload holds
+    the expiry time and the signature is an HMAC-SHA256 of it. Any worker or
+    replica sharing the key verifies them without shared state.
+
+    Verified tokens are remembered in a small LRU cache, so repeated requests
+    with the same token skip the signature check.
+    """
+
+    def __init__(self, key: str, cache_size: int = 10000):
+        self._key = key.encode()
+        self.cache_size = cache_size
+        self._verified: OrderedDict[str, float] = OrderedDict()
+
+    def _sign(self, payload: str) -> str:
+        return _b64encode(hmac.new(self._key, payload.encode(), hashlib.sha256).digest())
+
+    def issue(self, expires_at: datetime) -> str:
+        """Sign a new token, naive `expires_at` is treated as UTC"""
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        payload = _b64encode(json.dumps({
+            "exp": int(expires_at.timestamp()),
+            "jti": secrets.token_urlsafe(8),
+        }).encode())
+        return f"{payload}.{self._sign(payload)}"
+
+    def verify(self, token: str) -> bool:
+        now = time.time()
+        expires_at = self._verified.get(token)
+        if expires_at is not None:
+            if expires_at > now:
+                self._verified.move_to_end(token)
+                return True
+            del self._verified[token]
+            return False
+
+        payload, _, signature = token.partition(".")
+        # Bytes, compare_digest rejects str with non-ASCII characters with a TypeError
+        if not signature or not hmac.compare_digest(signature.encode(), self._sign(payload).encode()):
+            return False
+        try:
+            expires_at = float(json.loads(_b64decode(payload))["exp"])
+        except (ValueError, KeyError, TypeError):
+            return False
+        if expires_at <= now:
+            return False
+
+        self._verified[token] = expires_at
+        if len(self._verified) > self.cache_size:
+            self._verified.popitem(last=False)
+        return True
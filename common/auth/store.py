@@ -0,0 +1,68 @@
+import asyncio
+import heapq
+from datetime import datetime
+
+from common.auth.tokendata import TokenData
+
+
+class TokenStore:
+    """
+    Issued access tokens with O(1) lookup.
+
+    Tokens are indexed by value in a dict, and a heap ordered by expiry time
+    lets expired tokens be purged without scanning the whole store. When the
+    store is full, the tokens closest to expiry are evicted first.
+    """
+
+    def __init__(self, max_size: int, purge_interval: float = 60.0):
+        self.max_size = max_size
+        self.purge_interval = purge_interval
+        self._tokens: dict[str, TokenData] = {}
+        self._expiry: list[tuple[datetime, str]] = []
+        self._purger: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def add(self, token_data: TokenData):
+        self.purge()
+        self._tokens[token_data.token] = token_data
+        heapq.heappush(self._expiry, (token_data.expires_at, token_data.token))
+        while len(self._tokens) > self.max_size:
+            self._pop_earliest()
+
+    def is_valid(self, token: str) -> bool:
+        token_data = self._tokens.get(token)
+        return token_data is not None and token_data.expires_at > datetime.utcnow()
+
+    def purge(self) -> int:
+        """Remove expired tokens, returns how many were removed"""
+        now = datetime.utcnow()
+        removed = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            removed += self._pop_earliest()
+        return removed
+
+    def _pop_earliest(self) -> int:
+        expires_at, token = heapq.heappop(self._expiry)
+        token_data = self._tokens.get(token)
+        # Skip heap entries left behind by a token that was re-added later
+        if token_data is None or token_data.expires_at != expires_at:
+            return 0
+        del self._tokens[token]
+        return 1
+
+    async def _purge_periodically(self):
+        while True:
+            await asyncio.sleep(self.purge_interval)
+            self.purge()
+
+    async def start(self):
+        if self._purger is None:
+            self._purger = asyncio.create_task(self._purge_periodically())
+
+    async def stop(self):
+        if self._purger is not None:
+            self._purger.cancel()
+            await asyncio.gather(self._purger, return_exceptions=True)
+            self._purger = None
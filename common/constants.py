@@ -2,3 +2,14 @@ import os
 
 
 SECRET_TOKEN = os.getenv("SECRET_TOKEN", "my_secret_token")
+
+# Maximum number of issued access tokens kept in memory
+TOKEN_STORE_MAX_SIZE = int(os.getenv("TOKEN_STORE_MAX_SIZE", "100000"))
+
+# "stateful": tokens are kept in the memory of the process that issued them,
+# "signed": stateless HMAC-signed tokens, valid in every worker and replica
+TOKEN_MODE = os.getenv("TOKEN_MODE", "stateful")
+# Key of the signed tokens, has to be the same on every replica
+TOKEN_SIGNING_KEY = os.getenv("TOKEN_SIGNING_KEY", SECRET_TOKEN)
+# Number of verified signed tokens remembered to skip signature checks
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
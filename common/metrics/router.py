@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from common.metrics.metrics import render
+
+
+metrics_router = APIRouter(tags=["METRICS"])
+
+@metrics_router.get("/metrics",
+                    summary="Метрики Prometheus",
+                    description="Гистограммы задержек и счётчики сервиса в текстовом формате Prometheus",
+                    response_class=PlainTextResponse)
+async def metrics():
+    """
+    Метрики сервиса в текстовом формате Prometheus.
+
+    Returns:
+        PlainTextResponse: Все зарегистрированные метрики
+    """
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from common.auth.signing import TokenSigner
+
+
+def _expires_in(seconds: float) -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=seconds)
+
+
+def test_issued_token_verifies():
+    signer = TokenSigner("key")
+    token = signer.issue(_expires_in(60))
+
+    assert signer.verify(token)
+    # The second check is served from the cache of verified tokens
+    assert signer.verify(token)
+
+
+def test_naive_expiry_is_utc():
+    signer = TokenSigner("key")
+
+    assert signer.verify(signer.issue(datetime.utcnow() + timedelta(seconds=60)))
+    assert not signer.verify(signer.issue(datetime.utcnow() - timedelta(seconds=60)))
+
+
+def test_other_key_is_rejected():
+    token = TokenSigner("key").issue(_expires_in(60))
+
+    assert not TokenSigner("other key").verify(token)
+
+
+def test_tampered_token_is_rejected():
+    signer = TokenSigner("key")
+    payload, _, signature = signer.issue(_expires_in(60)).partition(".")
+    other_payload, _, _ = signer.issue(_expires_in(3600)).partition(".")
+
+    assert not signer.verify(f"{other_payload}.{signature}")
+    assert not signer.verify(f"{payload}.{signature[:-1]}")
+    assert not signer.verify(payload)
+
+
+def test_expired_token_is_rejected():
+    signer = TokenSigner("key")
+
+    assert not signer.verify(signer.issue(_expires_in(-1)))
+
+
+def test_cached_token_expires(monkeypatch):
+    signer = TokenSigner("key")
+    token = signer.issue(_expires_in(60))
+    assert signer.verify(token)
+
+    monkeypatch.setattr("common.auth.signing.time.time", lambda: _expires_in(120).timestamp())
+    assert not signer.verify(token)
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    ".",
+    "not a token",
+    "payload.signature",
+    "токен.подпись",
+    "eyJleHAiOiAxfQ.ü",
+])
+def test_malformed_token_is_rejected(token):
+    assert not TokenSigner("key").verify(token)
+
+
+def test_signed_payload_without_expiry_is_rejected():
+    signer = TokenSigner("key")
+    # Validly signed, but not a token payload
+    for payload in ("bm90IGpzb24", "e30", "WzFd"):
+        assert not signer.verify(f"{payload}.{signer._sign(payload)}")
+
+
+def test_cache_is_bounded():
+    signer = TokenSigner("key", cache_size=2)
+    for _ in range(5):
+        assert signer.verify(signer.issue(_expires_in(60)))
+
+    assert len(signer._verified) == 2
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+from common.auth.store import TokenStore
+from common.auth.tokendata import TokenData
+
+
+def _token(name: str, expires_in: float) -> TokenData:
+    return TokenData(name, datetime.utcnow() + timedelta(seconds=expires_in))
+
+
+def test_valid_until_expiry():
+    store = TokenStore(max_size=10)
+    store.add(_token("live", 60))
+    store.add(_token("expired", -1))
+
+    assert store.is_valid("live")
+    assert not store.is_valid("expired")
+    assert not store.is_valid("unknown")
+
+
+def test_purge_removes_only_expired():
+    store = TokenStore(max_size=10)
+    store.add(_token("live", 60))
+    store.add(_token("expired", -1))
+
+    assert store.purge() == 1
+    assert len(store) == 1
+    assert store.is_valid("live")
+
+
+def test_add_purges_expired():
+    store = TokenStore(max_size=10)
+    store.add(_token("expired", -1))
+    store.add(_token("live", 60))
+
+    assert len(store) == 1
+    assert store.is_valid("live")
+
+
+def test_full_store_evicts_closest_to_expiry():
+    store = TokenStore(max_size=2)
+    store.add(_token("late", 300))
+    store.add(_token("early", 60))
+    store.add(_token("middle", 120))
+
+    assert len(store) == 2
+    assert not store.is_valid("early")
+    assert store.is_valid("middle")
+    assert store.is_valid("late")
+
+
+def test_readded_token_keeps_new_expiry():
+    store = TokenStore(max_size=2)
+    store.add(_token("token", 60))
+    store.add(_token("token", 600))
+    store.add(_token("other", 300))
+    store.add(_token("third", 400))
+
+    # The stale heap entry of the first add doesn't evict the re-added token
+    assert store.is_valid("token")
+    assert not store.is_valid("other")
+    assert len(store) == 2
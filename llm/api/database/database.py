@@ -1,4 +1,4 @@
-import psycopg
+from psycopg_pool import AsyncConnectionPool
 from sqlalchemy.ext.asyncio import (
     create_async_engine, 
     async_sessionmaker
@@ -7,6 +7,7 @@ from config import config
 from sqlalchemy import create_engine
 from sqlalchemy.orm import DeclarativeBase
 from langchain_postgres.chat_message_histories import PostgresChatMessageHistory
+from langchain_core.messages import BaseMessage, messages_from_dict
 
 CONNECT_STRING = f"postgresql://{config.db_url.username}:{config.db_url.password}\
 @{config.db_url.host}:\
@@ -60,38 +61,188 @@ try:
     sync_raw_psycopg_conn = sync_connection.driver_connection
     if sync_raw_psycopg_conn is not None:
         PostgresChatMessageHistory.create_tables(sync_raw_psycopg_conn, "chat_history")
+        with sync_raw_psycopg_conn.cursor() as cursor:
+            # Serves the "last N messages of a dialog" query without sorting
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_chat_history_session_id_id "
+                "ON chat_history (session_id, id)"
+            )
+            # Rolling summary of the messages that fell out of the history window
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS chat_history_summary ("
+                "session_id UUID PRIMARY KEY, "
+                "summary TEXT NOT NULL, "
+                "last_message_id INTEGER NOT NULL, "
+                "updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW())"
+            )
+            # Embeddings of the document chunks by model and sha256 of the chunk text
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_cache ("
+                "model TEXT NOT NULL, "
+                "text_hash BYTEA NOT NULL, "
+                "embedding REAL[] NOT NULL, "
+                "created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(), "
+                "PRIMARY KEY (model, text_hash))"
+            )
+            # Versions of the vectorstore collections, bumped whenever their
+            # documents change, shared by all the workers of the retrieval cache
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS retrieval_versions ("
+                "collection TEXT PRIMARY KEY, "
+                "version BIGINT NOT NULL)"
+            )
+        sync_raw_psycopg_conn.commit()
 finally:
     connect.close()
     
+# Pool of raw psycopg connections for the chat history and the embedding cache,
+# opened in the lifespan of the app
+chat_history_pool = AsyncConnectionPool(
+    CONNECT_STRING,
+    min_size=config.chat_history_pool_min_size,
+    max_size=config.chat_history_pool_max_size,
+    max_idle=config.chat_history_pool_max_idle,
+    check=AsyncConnectionPool.check_connection,
+    open=False,
+)
+
 async def clear_chat_history(session_id: str):
-    connection = await psycopg.AsyncConnection.connect(CONNECT_STRING)
-    try:
+    async with chat_history_pool.connection() as connection:
         await PostgresChatMessageHistory(
             "chat_history", 
             session_id, 
             async_connection=connection
         ).aclear()
-    finally:
-        await connection.close()
+        await connection.execute(
+            "DELETE FROM chat_history_summary WHERE session_id = %s",
+            (session_id,)
+        )
 
 
 async def get_chat_history(session_id: str):
-    connection = await psycopg.AsyncConnection.connect(CONNECT_STRING)
-    try:
+    async with chat_history_pool.connection() as connection:
         return await PostgresChatMessageHistory(
             "chat_history", 
             session_id, 
             async_connection=connection
         ).aget_messages()
-    finally:
-        await connection.close()
 
 async def add_messages_to_chat_history(session_id: str, messages: list):
-    connection = await psycopg.AsyncConnection.connect(CONNECT_STRING)
-    chat_history = PostgresChatMessageHistory(
-        "chat_history", 
-        session_id, 
-        async_connection=connection
-    )
-    await chat_history.aadd_messages(messages)
-    await connection.close()
\ No newline at end of file
+    async with chat_history_pool.connection() as connection:
+        chat_history = PostgresChatMessageHistory(
+            "chat_history", 
+            session_id, 
+            async_connection=connection
+        )
+        await chat_history.aadd_messages(messages)
+
+
+async def get_recent_chat_history(
+        session_id: str,
+        limit: int,
+        after_id: int = 0
+    ) -> tuple[list[BaseMessage], int | None]:
+    """
+    Last `limit` messages of the dialog with id > after_id in chronological
+    order and the id of the oldest of them
+    """
+    async with chat_history_pool.connection() as connection:
+        cursor = await connection.execute(
+            "SELECT id, message FROM chat_history "
+            "WHERE session_id = %s AND id > %s ORDER BY id DESC LIMIT %s",
+            (session_id, after_id, limit)
+        )
+        rows = await cursor.fetchall()
+    rows.reverse()
+    return messages_from_dict([row[1] for row in rows]), rows[0][0] if rows else None
+
+
+async def get_chat_history_range(
+        session_id: str,
+        after_id: int,
+        before_id: int,
+        limit: int
+    ) -> list[tuple[int, BaseMessage]]:
+    """Up to `limit` oldest messages of the dialog with after_id < id < before_id"""
+    async with chat_history_pool.connection() as connection:
+        cursor = await connection.execute(
+            "SELECT id, message FROM chat_history "
+            "WHERE session_id = %s AND id > %s AND id < %s ORDER BY id LIMIT %s",
+            (session_id, after_id, before_id, limit)
+        )
+        rows = await cursor.fetchall()
+    return list(zip([row[0] for row in rows], messages_from_dict([row[1] for row in rows])))
+
+
+async def get_chat_summary(session_id: str) -> tuple[str, int] | None:
+    """Summary of the older part of the dialog and the id of the last summarized message"""
+    async with chat_history_pool.connection() as connection:
+        cursor = await connection.execute(
+            "SELECT summary, last_message_id FROM chat_history_summary WHERE session_id = %s",
+            (session_id,)
+        )
+        row = await cursor.fetchone()
+    return (row[0], row[1]) if row else None
+
+
+async def save_chat_summary(session_id: str, summary: str, last_message_id: int):
+    """
+    Stores the summary unless a newer one is already there: workers and
+    replicas may summarize the same dialog at once
+    """
+    async with chat_history_pool.connection() as connection:
+        await connection.execute(
+            "INSERT INTO chat_history_summary (session_id, summary, last_message_id) "
+            "VALUES (%s, %s, %s) "
+            "ON CONFLICT (session_id) DO UPDATE SET "
+            "summary = EXCLUDED.summary, "
+            "last_message_id = EXCLUDED.last_message_id, "
+            "updated_at = NOW() "
+            "WHERE chat_history_summary.last_message_id < EXCLUDED.last_message_id",
+            (session_id, summary, last_message_id)
+        )
+
+
+async def get_cached_embeddings(model: str, text_hashes: list[bytes]) -> dict[bytes, list[float]]:
+    """Stored embeddings of the chunks with the given text hashes, missing ones are left out"""
+    async with chat_history_pool.connection() as connection:
+        cursor = await connection.execute(
+            "SELECT text_hash, embedding FROM embedding_cache "
+            "WHERE model = %s AND text_hash = ANY(%s)",
+            (model, text_hashes)
+        )
+        rows = await cursor.fetchall()
+    return {bytes(row[0]): row[1] for row in rows}
+
+
+async def save_cached_embeddings(model: str, embeddings: dict[bytes, list[float]]):
+    async with chat_history_pool.connection() as connection:
+        async with connection.cursor() as cursor:
+            await cursor.executemany(
+                "INSERT INTO embedding_cache (model, text_hash, embedding) "
+                "VALUES (%s, %s, %s) ON CONFLICT DO NOTHING",
+                [(model, text_hash, embedding) for text_hash, embedding in embeddings.items()]
+            )
+
+
+async def get_retrieval_version(collection: str) -> int:
+    async with chat_history_pool.connection() as connection:
+        cursor = await connection.execute(
+            "SELECT version FROM retrieval_versions WHERE collection = %s",
+            (collection,)
+        )
+        row = await cursor.fetchone()
+    return row[0] if row else 0
+
+
+async def bump_retrieval_version(collection: str) -> int:
+    async with chat_history_pool.connection() as connection:
+        cursor = await connection.execute(
+            "INSERT INTO retrieval_versions (collection, version) VALUES (%s, 1) "
+            "ON CONFLICT (collection) DO UPDATE SET "
+            "version = retrieval_versions.version + 1 "
+            "RETURNING version",
+            (collection,)
+        )
+        row = await cursor.fetchone()
+    return row[0]
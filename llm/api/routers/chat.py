@@ -1,6 +1,9 @@
+import json
+from typing import AsyncIterator
 from uuid import UUID
 from fastapi import APIRouter, Depends, File, UploadFile
-from api.utils.chains import run_llm_pipeline
+from fastapi.responses import StreamingResponse
+from api.utils.chains import run_llm_pipeline, stream_llm_pipeline
 from api.models.requests import TextCompletionRequest
 from langchain_core.messages import AIMessage
 from api.utils.asr import ASR
@@ -72,6 +75,90 @@ async def audio_answer(
         file
     )
 
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _sse_answer(tokens: AsyncIterator[str], transcript: str | None = None) -> AsyncIterator[str]:
+    if transcript is not None:
+        yield _sse_event("transcript", {"text": transcript})
+    async for token in tokens:
+        yield _sse_event("token", {"content": token})
+    yield _sse_event("done", {})
+
+
+@chat_router.post("/v1/chat/completion/text/stream",
+                 summary="Потоковая обработка текстового запроса",
+                 description="Отправка текстового сообщения в чат и получение ответа языковой модели по мере генерации (Server-Sent Events)")
+async def text_answer_stream(
+    request: TextCompletionRequest = Depends(),
+    picture: UploadFile | None = None
+) -> StreamingResponse:
+    """
+    Отправка текстового запроса и необязательного изображения в чат с потоковым ответом.
+
+    Ответ передаётся в формате Server-Sent Events: событие `token` с полем `content`
+    для каждого фрагмента ответа и событие `done` по окончании генерации.
+    Диалог сохраняется в истории после завершения ответа.
+
+    Args:
+        request: Текстовый запрос пользователя и идентификатор диалога
+        picture: Необязательное изображение, которое будет прикреплено к запросу
+
+    Returns:
+        StreamingResponse: Поток событий с фрагментами ответа
+    """
+    file = None
+    if picture:
+        file = picture.file.read()
+    return StreamingResponse(
+        _sse_answer(stream_llm_pipeline(str(request.dialog_id), request.query, file)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+@chat_router.post("/v1/chat/completion/audio/stream",
+                 summary="Потоковая обработка аудиозапроса",
+                 description="Преобразование аудио в текст через ASR и получение ответа языковой модели по мере генерации (Server-Sent Events)")
+async def audio_answer_stream(
+    dialog_id: UUID,
+    audio:  UploadFile = File(...),
+    picture: UploadFile | None = None
+) -> StreamingResponse:
+    """
+    Отправка аудиозапроса и необязательного изображения в чат с потоковым ответом.
+
+    Ответ передаётся в формате Server-Sent Events: событие `transcript` с распознанным
+    текстом запроса, событие `token` с полем `content` для каждого фрагмента ответа
+    и событие `done` по окончании генерации.
+
+    Args:
+        dialog_id: Идентификатор диалога
+        audio: Аудиофайл, который будет преобразован в текст с помощью ASR
+        picture: Необязательное изображение, которое будет прикреплено к запросу
+
+    Returns:
+        StreamingResponse: Поток событий с фрагментами ответа
+
+    Raises:
+        Exception: Если аудиофайл не содержит имя файла или не удалось получить текст из аудио
+    """
+    file = None
+    if not audio.filename:
+        raise Exception("FILE WIHTOUT FILENAME")
+    if picture:
+        file = picture.file.read()
+    query = await ASR().transcribe(audio.file.read())
+    if not query.get("text"):
+        raise Exception("NOT FOUND TEXT IN AUDIO")
+    return StreamingResponse(
+        _sse_answer(stream_llm_pipeline(str(dialog_id), query['text'], file), transcript=query['text']),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
 @chat_router.post("/v1/chat/clear",
                  summary="Очистка истории чата",
                  description="Удаление всей истории диалога по указанному идентификатору")
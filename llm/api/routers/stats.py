@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Depends
+from common.auth.auth import require_valid_token
+from api.utils.http import HTTP_CLIENTS
+from api.database.database import chat_history_pool
+from api.utils.answer_cache import ANSWER_CACHE
+from api.utils.retrieval_cache import RETRIEVAL_CACHE
+from api.utils.vector_index import vector_storage_stats
+from api.utils.vectorstore import RECALL
+
+stats_router = APIRouter(tags=["STATS"], dependencies=[Depends(require_valid_token)])
+
+@stats_router.get("/v1/stats/http",
+                  summary="Статистика HTTP-клиентов",
+                  description="Загрузка пулов соединений к внешним сервисам (ASR, Docling)")
+async def http_stats() -> dict[str, dict]:
+    """
+    Статистика пулов соединений к внешним сервисам.
+
+    Returns:
+        dict: Для каждого сервиса размер пула, число запросов в работе, доля занятых соединений,
+            общее число запросов и ошибок, число созданных и переиспользованных соединений
+    """
+    return HTTP_CLIENTS.stats()
+
+
+@stats_router.get("/v1/stats/db",
+                  summary="Статистика пула соединений к базе данных",
+                  description="Состояние пула соединений, используемого для истории чатов")
+async def db_stats() -> dict[str, int]:
+    """
+    Статистика пула соединений истории чатов.
+
+    Returns:
+        dict: Размер пула, число свободных соединений, ожидающих запросов,
+            а также счётчики выданных соединений, ошибок и времени ожидания (psycopg_pool)
+    """
+    return chat_history_pool.get_stats()
+
+
+
+@stats_router.get("/v1/stats/vectorstore",
+                  summary="Статистика векторного хранилища",
+                  description="Объём таблицы эмбеддингов и индексов, доля попаданий в буферный кэш и полнота приближённого поиска")
+async def vectorstore_stats() -> dict:
+    """
+    Статистика хранения эмбеддингов.
+
+    Returns:
+        dict: Режим хранения, размеры таблицы эмбеддингов, её индексов и ANN-индексов в байтах,
+            доля чтений из буферного кэша PostgreSQL для таблицы, TOAST и индексов,
+            а также полнота (recall) приближённого поиска по выборке запросов
+    """
+    return {
+        **await vector_storage_stats(),
+        "recall_samples": RECALL.samples,
+        "recall": RECALL.recall,
+    }
+
+
+@stats_router.get("/v1/stats/cache",
+                  summary="Статистика кэшей",
+                  description="Заполненность и доля попаданий кэша поиска документов и семантического кэша ответов")
+async def cache_stats() -> dict[str, dict]:
+    """
+    Статистика кэшей конвейера.
+
+    Returns:
+        dict: Для кэша поиска (`retrieval`) и семантического кэша ответов (`answers`)
+            число записей, попаданий и промахов и доля попаданий
+    """
+    return {
+        "retrieval": RETRIEVAL_CACHE.stats(),
+        "answers": ANSWER_CACHE.stats(),
+    }
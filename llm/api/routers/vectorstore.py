@@ -3,7 +3,8 @@ from uuid import UUID
 from fastapi import APIRouter, Depends, File, UploadFile
 from api.models.requests import AddDocumentsRequest, RemoveDocumentsRequest
 from common.auth.auth import require_valid_token
-from api.utils.vectorstore import create_vectorstore
+from api.utils.vectorstore import VECTORSTORES
+from api.database.database import bump_retrieval_version
 from api.models.responses import AddDocumentsResponse
 from api.utils.parser import (
     convert_file_async,
@@ -23,8 +24,9 @@ async def remove_documents(request: RemoveDocumentsRequest):
     Args:
         request: Объект запроса, содержащий идентификатор диалога и список идентификаторов документов для удаления
     """
-    vectorstore = create_vectorstore(str(request.dialog_id))
+    vectorstore = await VECTORSTORES.get(str(request.dialog_id))
     await vectorstore.adelete(request.ids)
+    await bump_retrieval_version(vectorstore.collection_name)
 
 @vectorstore_router.post("/v1/parse/document",
                         summary="Парсинг и добавление документа",
@@ -51,9 +53,9 @@ async def parse_document(dialog_id: UUID, file: UploadFile = File()) -> AddDocum
         task_complited = await get_result_task_convert(task_id)
         await asyncio.sleep(10)
     text, filename = task_complited
-    vectorstore = create_vectorstore(str(dialog_id))
+    vectorstore = await VECTORSTORES.get(str(dialog_id))
     splitter = create_splitter()
     documents = await split_text(text, splitter, source=filename)
-    return AddDocumentsResponse(
-        ids=await vectorstore.aadd_documents(documents)
-    )
\ No newline at end of file
+    ids = await vectorstore.aadd_documents(documents)
+    await bump_retrieval_version(vectorstore.collection_name)
+    return AddDocumentsResponse(ids=ids)
\ No newline at end of file
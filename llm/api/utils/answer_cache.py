@@ -0,0 +1,112 @@
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import count
+from langchain_core.documents import Document
+from common.metrics.metrics import CallbackCounter, Gauge
+from config import config
+
+
+def documents_key(documents: list[Document]) -> str:
+    """
+    Identity of a retrieved document set by content, the same material uploaded
+    into different dialogs has the same key
+    """
+    hashes = sorted(
+        hashlib.sha256(document.page_content.encode("utf-8")).hexdigest()
+        for document in documents
+    )
+    return hashlib.sha256("".join(hashes).encode("ascii")).hexdigest()
+
+
+def _normalize(embedding: list[float]) -> list[float]:
+    norm = math.sqrt(sum(value * value for value in embedding))
+    return [value / norm for value in embedding] if norm else embedding
+
+
+@dataclass
+class _Answer:
+    documents: str
+    embedding: list[float]
+    answer: str
+    created: float
+
+
+class SemanticAnswerCache:
+    """
+    Answers to earlier questions, found by the similarity of the query embedding.
+    An answer is only reused for a question that retrieved the same documents
+    """
+
+    def __init__(self, max_size: int, threshold: float, ttl: float):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl = ttl
+        self._ids = count()
+        self._entries: OrderedDict[int, _Answer] = OrderedDict()
+        self._by_documents: dict[str, set[int]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        ids = self._by_documents[entry.documents]
+        ids.discard(entry_id)
+        if not ids:
+            del self._by_documents[entry.documents]
+
+    def get(self, embedding: list[float], documents: list[Document]) -> str | None:
+        key = documents_key(documents)
+        query = _normalize(embedding)
+        now = time.monotonic()
+        best_id, best_similarity = None, self.threshold
+        for entry_id in list(self._by_documents.get(key, ())):
+            entry = self._entries[entry_id]
+            if now - entry.created > self.ttl:
+                self._remove(entry_id)
+                continue
+            similarity = sum(a * b for a, b in zip(query, entry.embedding))
+            if similarity >= best_similarity:
+                best_id, best_similarity = entry_id, similarity
+        if best_id is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(best_id)
+        self.hits += 1
+        return self._entries[best_id].answer
+
+    def put(self, embedding: list[float], documents: list[Document], answer: str):
+        if self.max_size <= 0:
+            return
+        entry_id = next(self._ids)
+        key = documents_key(documents)
+        self._entries[entry_id] = _Answer(key, _normalize(embedding), answer, time.monotonic())
+        self._by_documents.setdefault(key, set()).add(entry_id)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": config.semantic_cache_enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+
+ANSWER_CACHE = SemanticAnswerCache(
+    config.semantic_cache_size,
+    config.semantic_cache_threshold,
+    config.semantic_cache_ttl
+)
+
+CallbackCounter("llm_answer_cache_hits_total", "Answers served from the semantic cache", lambda: ANSWER_CACHE.hits)
+CallbackCounter("llm_answer_cache_misses_total", "Questions not found in the semantic cache", lambda: ANSWER_CACHE.misses)
+Gauge("llm_answer_cache_entries", "Answers in the semantic cache", lambda: len(ANSWER_CACHE))
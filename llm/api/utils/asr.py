@@ -1,32 +1,84 @@
+import asyncio
 import uuid
+from datetime import datetime, timedelta, timezone
 import aiohttp
 from config import config
+from api.utils.http import HTTP_CLIENTS
+from api.utils.metrics import UPSTREAM_SECONDS
 
 class ASR:
     __transcribe_url = config.asr_url.removesuffix("/") + "/transcribe"
     __get_token_url = config.asr_url.removesuffix("/") + "/generate-token"
+    # Refresh the token this long before it expires
+    __refresh_margin = timedelta(minutes=5)
+
+    # Access token shared by all instances, refreshed under the lock so
+    # concurrent callers wait for one in-flight refresh
+    __token: str | None = None
+    __expires_at: datetime | None = None
+    __lock = asyncio.Lock()
     
     
     async def __get_token(self):
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                self.__get_token_url, 
-                json={"secret_token": config.secret_token}
-            ) as response:
-                response_json = await response.json()
-                return response_json
+        session = HTTP_CLIENTS.session("asr")
+        async with session.post(
+            self.__get_token_url, 
+            json={"secret_token": config.secret_token}
+        ) as response:
+            response.raise_for_status()
+            response_json = await response.json()
+            return response_json
 
-    async def transcribe(self, file: bytes):
-        token = await self.__get_token()
-        print(token)
+    @classmethod
+    def __is_fresh(cls) -> bool:
+        return (
+            cls.__token is not None
+            and cls.__expires_at is not None
+            and datetime.now(timezone.utc) < cls.__expires_at - cls.__refresh_margin
+        )
+
+    async def __access_token(self, rejected: str | None = None) -> str:
+        """Cached access token, `rejected` is a token the ASR service answered 401 to"""
+        cls = type(self)
+        if cls.__is_fresh() and cls.__token != rejected:
+            return cls.__token  # type: ignore
+        async with cls.__lock:
+            # Another caller may have refreshed it while we were waiting
+            if cls.__is_fresh() and cls.__token != rejected:
+                return cls.__token  # type: ignore
+            with UPSTREAM_SECONDS.time(upstream="asr", operation="token"):
+                token = await self.__get_token()
+            expires_at = datetime.fromisoformat(token["expires_at"])
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            cls.__token = token["access_token"]
+            cls.__expires_at = expires_at
+            return cls.__token  # type: ignore
+
+    async def __post_audio(self, file: bytes, token: str) -> dict | None:
+        """Transcription result, None if the token was rejected"""
         headers = {
             "accept": "application/json",
-            "Authorization": f"Bearer {token.get('access_token')}",
+            "Authorization": f"Bearer {token}",
         }
 
-        async with aiohttp.ClientSession() as session:
-            form = aiohttp.FormData()
-            form.add_field('file', file, filename=f"{uuid.uuid4()}", content_type='audio/type')
-            async with session.post(self.__transcribe_url, headers=headers, data=form) as response:
-                response_json = await response.json()
-                return response_json
\ No newline at end of file
+        session = HTTP_CLIENTS.session("asr")
+        form = aiohttp.FormData()
+        form.add_field('file', file, filename=f"{uuid.uuid4()}", content_type='audio/type')
+        async with session.post(self.__transcribe_url, headers=headers, data=form) as response:
+            if response.status == 401:
+                return None
+            response_json = await response.json()
+            return response_json
+
+    async def transcribe(self, file: bytes):
+        with UPSTREAM_SECONDS.time(upstream="asr", operation="transcribe"):
+            token = await self.__access_token()
+            result = await self.__post_audio(file, token)
+            if result is None:
+                # The ASR service restarted or dropped the token, retry once with a new one
+                token = await self.__access_token(rejected=token)
+                result = await self.__post_audio(file, token)
+                if result is None:
+                    raise Exception("ASR TOKEN REJECTED")
+            return result
@@ -0,0 +1,28 @@
+import asyncio
+import logging
+from typing import Coroutine
+
+logger = logging.getLogger(__name__)
+
+# Strong references to the running tasks, the event loop only keeps weak ones
+_tasks: set[asyncio.Task] = set()
+
+
+def _done(task: asyncio.Task):
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background task failed", exc_info=task.exception())
+
+
+def run_in_background(coro: Coroutine) -> asyncio.Task:
+    """Run work that the response doesn't have to wait for"""
+    task = asyncio.create_task(coro)
+    _tasks.add(task)
+    task.add_done_callback(_done)
+    return task
+
+
+async def drain_background(timeout: float = 30):
+    """Wait for the pending background work on shutdown"""
+    if _tasks:
+        await asyncio.wait(list(_tasks), timeout=timeout)
@@ -1,48 +1,183 @@
 from api.utils.llm import LLM
-from api.database.database import add_messages_to_chat_history, get_chat_history
-from api.utils.vectorstore import create_vectorstore, query_vectorstore
+from api.database.database import add_messages_to_chat_history
+from api.utils.answer_cache import ANSWER_CACHE
+from api.utils.background import run_in_background
+from api.utils.history import load_chat_history, refresh_summary
+from api.utils.metrics import PIPELINE_ERRORS, PIPELINE_STAGE_SECONDS, PIPELINE_STAGE_TIMEOUTS
+from api.utils.tracing import trace_callbacks
+from api.utils.vectorstore import VECTORSTORES, search_vectorstore
 from langchain.messages import HumanMessage, AIMessage
+from langchain_core.messages import AIMessageChunk
+from langchain_core.documents import Document
+from typing import AsyncIterator, Awaitable, TypeVar
+from config import config
+import asyncio
 import base64
+import logging
 
 from prompts.main_prompt import create_prompt
 
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+ERROR_ANSWER = "Произошла ошибка повторите запрос позже"
+
+
+async def _stage(name: str, stage: Awaitable[T], timeout: float, default: T) -> T:
+    """Run a pipeline stage, falling back to `default` when it exceeds its timeout"""
+    try:
+        with PIPELINE_STAGE_SECONDS.time(stage=name):
+            return await asyncio.wait_for(stage, timeout)
+    except asyncio.TimeoutError:
+        PIPELINE_STAGE_TIMEOUTS.inc(stage=name)
+        logger.warning("Stage %s timed out after %s s", name, timeout)
+        return default
+
+
+async def _retrieve(dialog_id: str, query: str) -> tuple[list[float] | None, list[Document]]:
+    vectorstore = await VECTORSTORES.get(dialog_id)
+    return await search_vectorstore(vectorstore, query)
+
+
+async def _encode_picture(picture: bytes) -> dict:
+    base64_image = await asyncio.to_thread(
+        lambda: base64.b64encode(picture).decode('utf-8')
+    )
+    return {
+        "type": "image_url",
+        "image_url": {
+            "url": f"data:image/jpeg;base64,{base64_image}"
+        }
+    }
+
+
+async def _persist_turn(dialog_id: str, query: str, answer: AIMessage):
+    with PIPELINE_STAGE_SECONDS.time(stage="persist"):
+        await add_messages_to_chat_history(
+            dialog_id,
+            [
+                HumanMessage(query),
+                answer
+            ])
+    with PIPELINE_STAGE_SECONDS.time(stage="summary"):
+        await refresh_summary(dialog_id)
+
+
+async def _prepare_inputs(
+        dialog_id: str,
+        query: str,
+        picture: bytes | None
+    ) -> tuple[dict, list[float] | None]:
+    """
+    Prompt inputs: the dialog history with the new user message and the retrieved
+    documents, and the query embedding if the retrieval succeeded
+    """
+    # Retrieval, history and image preprocessing don't depend on each other,
+    # so the latency before the LLM call is that of the slowest stage
+    async with asyncio.TaskGroup() as stages:
+        rag_stage = stages.create_task(
+            _stage("retrieval", _retrieve(dialog_id, query), config.retrieval_timeout, (None, []))
+        )
+        history_stage = stages.create_task(
+            _stage("history", load_chat_history(dialog_id), config.history_timeout, [])
+        )
+        picture_stage = stages.create_task(
+            _stage("picture", _encode_picture(picture), config.picture_timeout, None)
+        ) if picture else None
+    messages = history_stage.result()
+    message = {
+        "role": "user",
+        "content": [
+            {"type": "text", "text": query},
+        ]
+    }
+    if picture_stage is not None and picture_stage.result() is not None:
+        message["content"].append(picture_stage.result())
+    messages.append(message) # type: ignore
+    embedding, rag = rag_stage.result()
+    return {"messages": messages, "rag": rag}, embedding
+
+
+def _answer_cacheable(picture: bytes | None, embedding: list[float] | None, rag: list[Document]) -> bool:
+    # An answer about an image or without the materials depends on more than the question
+    return config.semantic_cache_enabled and picture is None and embedding is not None and bool(rag)
+
+
 async def run_llm_pipeline(
         dialog_id: str, 
         query: str = "", 
         picture: bytes | None = None
     ) -> AIMessage:
     dialog_id = str(dialog_id)
-    vectorstore = create_vectorstore(dialog_id)
-    rag = await query_vectorstore(vectorstore, query)
-    messages = await get_chat_history(dialog_id)
+    inputs, embedding = await _prepare_inputs(dialog_id, query, picture)
+    cacheable = _answer_cacheable(picture, embedding, inputs["rag"])
+    cached = ANSWER_CACHE.get(embedding, inputs["rag"]) if cacheable else None # type: ignore
+    if cached is not None:
+        answer = AIMessage(cached)
+        run_in_background(_persist_turn(dialog_id, query, answer))
+        return answer
     try:
-        message = {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": query},
-            ]
-        }
-        if picture:
-            base64_image = base64.b64encode(picture).decode('utf-8')
-            message["content"].append(
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{base64_image}"
-                    }
-                }
-            )
         prompt = create_prompt()
-        messages.append(message) # type: ignore
-        answer = await (prompt | LLM).ainvoke(
-            {"messages": messages, "rag": rag}
-        )
+        with PIPELINE_STAGE_SECONDS.time(stage="llm"):
+            answer = await (prompt | LLM).ainvoke(
+                inputs,
+                config={"callbacks": trace_callbacks()}
+            )
+        if cacheable and answer.text:
+            ANSWER_CACHE.put(embedding, inputs["rag"], answer.text) # type: ignore
     except:
-        answer = AIMessage("Произошла ошибка повторите запрос позже")
-    await add_messages_to_chat_history(
+        PIPELINE_ERRORS.inc(stage="llm")
+        answer = AIMessage(ERROR_ANSWER)
+    # Saving the turn doesn't delay the answer
+    run_in_background(_persist_turn(dialog_id, query, answer))
+    return answer
+
+
+async def stream_llm_pipeline(
+        dialog_id: str,
+        query: str = "",
+        picture: bytes | None = None
+    ) -> AsyncIterator[str]:
+    """
+    Same as `run_llm_pipeline`, but yields the answer text piece by piece as
+    the LLM generates it. The turn is saved once the answer is complete,
+    an interrupted stream is not saved.
+    """
+    dialog_id = str(dialog_id)
+    inputs, embedding = await _prepare_inputs(dialog_id, query, picture)
+    cacheable = _answer_cacheable(picture, embedding, inputs["rag"])
+    cached = ANSWER_CACHE.get(embedding, inputs["rag"]) if cacheable else None # type: ignore
+    if cached is not None:
+        yield cached
+        run_in_background(_persist_turn(dialog_id, query, AIMessage(cached)))
+        return
+    answer: AIMessageChunk | None = None
+    try:
+        prompt = create_prompt()
+        with PIPELINE_STAGE_SECONDS.time(stage="llm"):
+            async for chunk in (prompt | LLM).astream(
+                inputs,
+                config={"callbacks": trace_callbacks()}
+            ):
+                answer = chunk if answer is None else answer + chunk # type: ignore
+                if chunk.text:
+                    yield chunk.text
+        if cacheable and answer is not None and answer.text:
+            ANSWER_CACHE.put(embedding, inputs["rag"], answer.text) # type: ignore
+    except Exception:
+        PIPELINE_ERRORS.inc(stage="llm")
+        answer = AIMessageChunk(ERROR_ANSWER)
+        yield ERROR_ANSWER
+    if answer is None:
+        answer = AIMessageChunk("")
+    run_in_background(_persist_turn(
         dialog_id,
-        [
-            HumanMessage(query),
-            answer
-        ])
-    return answer
\ No newline at end of file
+        query,
+        AIMessage(
+            content=answer.content,
+            id=answer.id,
+            response_metadata=answer.response_metadata,
+            usage_metadata=answer.usage_metadata
+        )
+    ))
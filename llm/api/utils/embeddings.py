@@ -1,4 +1,162 @@
+import asyncio
+import hashlib
+import logging
+from array import array
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
 from langchain_huggingface import HuggingFaceEndpointEmbeddings
+from api.database.database import get_cached_embeddings, save_cached_embeddings
+from api.utils.metrics import EMBEDDING_BATCH_RETRIES, EMBEDDING_CACHE_LOOKUPS
 from config import config
 
-EMBEDDINGS = HuggingFaceEndpointEmbeddings(model=config.embeddings)
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+
+def _text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings of document chunks cached by the chunk text: an in-process LRU
+    of float32 arrays bounded by `max_bytes` in front of the embedding_cache
+    table. The same document uploaded into another dialog is embedded without
+    calls to the embedding model.
+    Chunks missing from the cache are embedded in batches of `batch_size`
+    with at most `concurrency` requests in flight across all ingestions.
+    Queries are passed through.
+    """
+
+    def __init__(
+            self,
+            embeddings: Embeddings,
+            model: str,
+            max_bytes: int,
+            batch_size: int,
+            concurrency: int,
+            max_retries: int,
+            retry_backoff: float
+        ):
+        self.embeddings = embeddings
+        self.model = model
+        self.max_bytes = max_bytes
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        # A list of Python floats takes ~32 bytes per dimension, an array 4
+        self._memory: OrderedDict[bytes, array] = OrderedDict()
+        self._memory_bytes = 0
+        self._in_flight = asyncio.Semaphore(max(1, concurrency))
+
+    def _remember(self, text_hash: bytes, embedding: list[float]):
+        vector = array("f", embedding)
+        size = len(vector) * vector.itemsize
+        if size > self.max_bytes:
+            return
+        previous = self._memory.pop(text_hash, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous) * previous.itemsize
+        self._memory[text_hash] = vector
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted) * evicted.itemsize
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.embeddings.aembed_query(text)
+
+    async def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """One request to the embedding model, retried with exponential backoff"""
+        attempt = 0
+        while True:
+            try:
+                async with self._in_flight:
+                    return await self.embeddings.aembed_documents(texts)
+            except Exception:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.retry_backoff * 2 ** attempt
+                attempt += 1
+                EMBEDDING_BATCH_RETRIES.inc()
+                logger.warning(
+                    "Embedding batch of %d chunks failed, retry %d/%d in %.1fs",
+                    len(texts), attempt, self.max_retries, delay, exc_info=True
+                )
+                await asyncio.sleep(delay)
+
+    async def _embed_missing(self, to_embed: dict[bytes, str]) -> dict[bytes, list[float]]:
+        """
+        Embeds the chunks in concurrent batches. Every batch is cached as soon as
+        it is done, so a retried ingestion skips the batches that succeeded
+        """
+        items = list(to_embed.items())
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+        computed: dict[bytes, list[float]] = {}
+
+        async def embed(batch: list[tuple[bytes, str]]):
+            embeddings = dict(zip(
+                [text_hash for text_hash, _ in batch],
+                await self._embed_batch([text for _, text in batch])
+            ))
+            try:
+                await save_cached_embeddings(self.model, embeddings)
+            except Exception:
+                logger.warning("Embedding cache update failed", exc_info=True)
+            for text_hash, embedding in embeddings.items():
+                self._remember(text_hash, embedding)
+            computed.update(embeddings)
+            logger.info("Embedded %d/%d chunks", len(computed), len(items))
+
+        async with asyncio.TaskGroup() as group:
+            for batch in batches:
+                group.create_task(embed(batch))
+        return computed
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        hashes = [_text_hash(text) for text in texts]
+        found: dict[bytes, list[float]] = {}
+        for text_hash in hashes:
+            if text_hash in self._memory:
+                self._memory.move_to_end(text_hash)
+                found[text_hash] = self._memory[text_hash].tolist()
+        EMBEDDING_CACHE_LOOKUPS.inc(len(found), tier="memory")
+
+        missing = [text_hash for text_hash in dict.fromkeys(hashes) if text_hash not in found]
+        if missing:
+            try:
+                stored = await get_cached_embeddings(self.model, missing)
+            except Exception:
+                logger.warning("Embedding cache lookup failed", exc_info=True)
+                stored = {}
+            EMBEDDING_CACHE_LOOKUPS.inc(len(stored), tier="db")
+            for text_hash, embedding in stored.items():
+                self._remember(text_hash, embedding)
+            found.update(stored)
+
+        # Texts of the chunks left to embed, duplicates within the batch embedded once
+        to_embed = {
+            text_hash: text for text_hash, text in zip(hashes, texts)
+            if text_hash not in found
+        }
+        if to_embed:
+            EMBEDDING_CACHE_LOOKUPS.inc(len(to_embed), tier="miss")
+            found.update(await self._embed_missing(to_embed))
+
+        return [found[text_hash] for text_hash in hashes]
+
+
+EMBEDDINGS = CachedEmbeddings(
+    HuggingFaceEndpointEmbeddings(model=config.embeddings),
+    model=config.embeddings,
+    max_bytes=config.embeddings_cache_max_bytes,
+    batch_size=config.embeddings_batch_size,
+    concurrency=config.embeddings_concurrency,
+    max_retries=config.embeddings_max_retries,
+    retry_backoff=config.embeddings_retry_backoff
+)
@@ -0,0 +1,75 @@
+import asyncio
+from langchain_core.messages import BaseMessage, SystemMessage, get_buffer_string
+from api.database.database import (
+    get_chat_history,
+    get_chat_history_range,
+    get_chat_summary,
+    get_recent_chat_history,
+    save_chat_summary
+)
+from api.utils.llm import LLM
+from api.utils.tracing import trace_callbacks
+from config import config
+from prompts.summary_prompt import create_summary_prompt
+
+# Most messages folded into the summary by one LLM call
+SUMMARY_CHUNK = 200
+
+# Dialogs whose summary is being updated right now by this process, other
+# processes are resolved by `save_chat_summary` keeping the newest summary
+_refreshing: set[str] = set()
+
+
+async def load_chat_history(dialog_id: str) -> list[BaseMessage]:
+    """
+    Messages sent to the LLM: the summary of the older part of the dialog
+    followed by every message after it. The summary lags the window by up to
+    `history_summary_batch` messages, so up to that many more than
+    `history_window` messages are sent rather than leaving a gap between them
+    """
+    if config.history_window <= 0:
+        return await get_chat_history(dialog_id)
+    summary = await get_chat_summary(dialog_id)
+    messages, _ = await get_recent_chat_history(
+        dialog_id,
+        config.history_window + config.history_summary_batch,
+        summary[1] if summary else 0
+    )
+    if summary and summary[0]:
+        messages.insert(0, SystemMessage(
+            f"### Краткое содержание предыдущей части диалога\n{summary[0]}"
+        ))
+    return messages
+
+
+async def refresh_summary(dialog_id: str):
+    """
+    Fold the messages that fell out of the history window into the stored
+    summary, once at least `history_summary_batch` of them have accumulated
+    """
+    if config.history_window <= 0 or dialog_id in _refreshing:
+        return
+    _refreshing.add(dialog_id)
+    try:
+        (_, oldest_id), summary = await asyncio.gather(
+            get_recent_chat_history(dialog_id, config.history_window),
+            get_chat_summary(dialog_id)
+        )
+        if oldest_id is None:
+            return
+        text, last_message_id = summary or ("", 0)
+        pending = await get_chat_history_range(dialog_id, last_message_id, oldest_id, SUMMARY_CHUNK)
+        if len(pending) < config.history_summary_batch:
+            return
+        answer = await (create_summary_prompt() | LLM).ainvoke({
+            "summary": text or "(пусто)",
+            "messages": get_buffer_string(
+                [message for _, message in pending],
+                human_prefix="Студент",
+                ai_prefix="Ассистент"
+            )
+        }, config={"callbacks": trace_callbacks()})
+        await save_chat_summary(dialog_id, str(answer.content), pending[-1][0])
+    finally:
+        _refreshing.discard(dialog_id)
+
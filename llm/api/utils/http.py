@@ -0,0 +1,133 @@
+from types import SimpleNamespace
+import aiohttp
+from config import config
+
+
+class Upstream:
+    """Pooled keep-alive session to one upstream service with its usage counters"""
+
+    def __init__(
+        self,
+        name: str,
+        pool_size: int,
+        connect_timeout: float,
+        read_timeout: float,
+        keepalive_timeout: float,
+    ):
+        self.name = name
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.session: aiohttp.ClientSession | None = None
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context: SimpleNamespace, params):
+            self.in_flight += 1
+            self.requests += 1
+
+        async def on_request_end(session, context: SimpleNamespace, params):
+            self.in_flight -= 1
+
+        async def on_request_exception(session, context: SimpleNamespace, params):
+            self.in_flight -= 1
+            self.errors += 1
+
+        async def on_connection_create_end(session, context: SimpleNamespace, params):
+            self.connections_created += 1
+
+        async def on_connection_reuseconn(session, context: SimpleNamespace, params):
+            self.connections_reused += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    async def start(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            limit_per_host=self.pool_size,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=300,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=self.connect_timeout,
+                sock_read=self.read_timeout,
+            ),
+            trace_configs=[self._trace_config()],
+        )
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def stats(self) -> dict:
+        return {
+            "pool_size": self.pool_size,
+            "in_flight": self.in_flight,
+            "utilization": round(self.in_flight / self.pool_size, 3) if self.pool_size else 0.0,
+            "requests": self.requests,
+            "errors": self.errors,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+        }
+
+
+class HttpClients:
+    """
+    Application-scoped HTTP sessions, one connection pool per upstream.
+
+    Sessions are opened in the lifespan of the app and reused by every
+    request, so calls to ASR and Docling skip TCP setup and DNS lookups.
+    """
+
+    def __init__(self, *upstreams: Upstream):
+        self._upstreams = {upstream.name: upstream for upstream in upstreams}
+
+    async def start(self):
+        for upstream in self._upstreams.values():
+            await upstream.start()
+
+    async def close(self):
+        for upstream in self._upstreams.values():
+            await upstream.close()
+
+    def session(self, name: str) -> aiohttp.ClientSession:
+        session = self._upstreams[name].session
+        if session is None:
+            raise RuntimeError("HTTP CLIENTS NOT STARTED")
+        return session
+
+    def stats(self) -> dict[str, dict]:
+        return {name: upstream.stats() for name, upstream in self._upstreams.items()}
+
+
+HTTP_CLIENTS = HttpClients(
+    Upstream(
+        "asr",
+        pool_size=config.asr_pool_size,
+        connect_timeout=config.http_connect_timeout,
+        read_timeout=config.asr_read_timeout,
+        keepalive_timeout=config.http_keepalive_timeout,
+    ),
+    Upstream(
+        "docling",
+        pool_size=config.docling_pool_size,
+        connect_timeout=config.http_connect_timeout,
+        read_timeout=config.docling_read_timeout,
+        keepalive_timeout=config.http_keepalive_timeout,
+    ),
+)
@@ -0,0 +1,31 @@
+from common.metrics.metrics import Counter, Histogram
+
+PIPELINE_STAGE_SECONDS = Histogram(
+    "llm_pipeline_stage_seconds",
+    "Duration of the stages of the chat pipeline",
+    ("stage",),
+)
+PIPELINE_STAGE_TIMEOUTS = Counter(
+    "llm_pipeline_stage_timeouts_total",
+    "Pipeline stages skipped because they exceeded their timeout",
+    ("stage",),
+)
+PIPELINE_ERRORS = Counter(
+    "llm_pipeline_errors_total",
+    "Pipeline stages that failed",
+    ("stage",),
+)
+UPSTREAM_SECONDS = Histogram(
+    "llm_upstream_request_seconds",
+    "Duration of the requests to the ASR and Docling services",
+    ("upstream", "operation"),
+)
+EMBEDDING_CACHE_LOOKUPS = Counter(
+    "llm_embedding_cache_lookups_total",
+    "Chunk embeddings looked up in the cache by the tier that served them (memory, db, miss)",
+    ("tier",),
+)
+EMBEDDING_BATCH_RETRIES = Counter(
+    "llm_embedding_batch_retries_total",
+    "Retried requests to the embedding model during ingestion",
+)
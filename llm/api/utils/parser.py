@@ -1,6 +1,8 @@
 from uuid import UUID
 import aiohttp
 from config import config
+from api.utils.http import HTTP_CLIENTS
+from api.utils.metrics import UPSTREAM_SECONDS
 
 
 async def convert_file_async(file: bytes, file_name: str | None) -> str | None:
@@ -22,12 +24,13 @@ async def convert_file_async(file: bytes, file_name: str | None) -> str | None:
         'do_ocr': 'true',
     }
 
-    async with aiohttp.ClientSession() as session:
-        form = aiohttp.FormData()
-        for key, value in data.items():
-            form.add_field(key, value)
-        form.add_field('files', file, filename=file_name, content_type='application/pdf')
+    session = HTTP_CLIENTS.session("docling")
+    form = aiohttp.FormData()
+    for key, value in data.items():
+        form.add_field(key, value)
+    form.add_field('files', file, filename=file_name, content_type='application/pdf')
 
+    with UPSTREAM_SECONDS.time(upstream="docling", operation="convert"):
         async with session.post(url, headers=headers, data=form) as response:
             resp_json = await response.json()
             return resp_json.get("task_id")
@@ -36,14 +39,15 @@ async def convert_file_async(file: bytes, file_name: str | None) -> str | None:
 async def get_result_task_convert(task_id: str | UUID) -> tuple[str, str | None] | None:
     url = f"{config.docling_url}/v1/result/{task_id}"
     task_id = str(task_id)
-    async with aiohttp.ClientSession() as session:
-        headers = {
-            'accept': 'application/json',
-            'X-Api-Key': config.docling_serve_api_key,
-        }
+    session = HTTP_CLIENTS.session("docling")
+    headers = {
+        'accept': 'application/json',
+        'X-Api-Key': config.docling_serve_api_key,
+    }
+    with UPSTREAM_SECONDS.time(upstream="docling", operation="result"):
         async with session.get(url, headers=headers) as response:
             resp_json = await response.json()
-            if resp_json.get("status", "pending") != "success":
-                return None
-            document = resp_json.get("document", {})
-            return document.get("md_content"), document.get("filename", None)
+    if resp_json.get("status", "pending") != "success":
+        return None
+    document = resp_json.get("document", {})
+    return document.get("md_content"), document.get("filename", None)
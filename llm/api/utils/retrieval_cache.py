@@ -0,0 +1,79 @@
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from langchain_core.documents import Document
+from common.metrics.metrics import CallbackCounter, Gauge
+from config import config
+
+
+def normalize_query(query: str) -> str:
+    """Same question typed differently: case, spacing and trailing punctuation are ignored"""
+    return re.sub(r"\s+", " ", query.casefold()).strip().rstrip("?!.,;: ")
+
+
+@dataclass
+class RetrievalEntry:
+    version: int
+    embedding: list[float]
+    documents: list[Document]
+
+
+class RetrievalCache:
+    """
+    Query embedding and retrieved documents by collection and normalized query.
+    Every collection has a version in the database that changes with its
+    documents, so an upload through any worker invalidates the entries of all
+    of them: entries stored under another version are never served
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple[str, str], RetrievalEntry] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, collection: str, query: str, version: int) -> RetrievalEntry | None:
+        """`version` is the current version of the collection"""
+        key = (collection, normalize_query(query))
+        entry = self._entries.get(key)
+        if entry is not None and entry.version != version:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, collection: str, query: str, version: int, embedding: list[float], documents: list[Document]):
+        """
+        `version` is the one the search started with, if the documents changed
+        during the search the entry is dropped by the next lookup
+        """
+        if self.max_size <= 0:
+            return
+        key = (collection, normalize_query(query))
+        self._entries[key] = RetrievalEntry(version, embedding, documents)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+
+RETRIEVAL_CACHE = RetrievalCache(config.retrieval_cache_size)
+
+CallbackCounter("llm_retrieval_cache_hits_total", "Retrievals served from the cache", lambda: RETRIEVAL_CACHE.hits)
+CallbackCounter("llm_retrieval_cache_misses_total", "Retrievals not found in the cache", lambda: RETRIEVAL_CACHE.misses)
+Gauge("llm_retrieval_cache_entries", "Entries of the retrieval cache", lambda: len(RETRIEVAL_CACHE))
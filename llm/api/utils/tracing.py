@@ -0,0 +1,14 @@
+import random
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.stdout import ConsoleCallbackHandler
+from config import config
+
+
+def trace_callbacks() -> list[BaseCallbackHandler]:
+    """
+    Console tracing for a `trace_sample_rate` share of the chain runs,
+    instead of the global LangChain debug mode that traced every run
+    """
+    if config.trace_sample_rate > 0 and random.random() < config.trace_sample_rate:
+        return [ConsoleCallbackHandler()]
+    return []
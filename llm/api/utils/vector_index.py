@@ -0,0 +1,257 @@
+import asyncio
+import logging
+from uuid import UUID
+
+from sqlalchemy import text
+
+from api.database.database import async_engine
+from config import config
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_TABLE = "langchain_pg_embedding"
+
+# Collections of the dialogs whose index is being built right now
+_maintaining: set[UUID] = set()
+
+_schema_lock = asyncio.Lock()
+_schema_ready = False
+# The ANN indexes need a column with a fixed dimension
+_ann_available = False
+
+
+def _index_name(collection_id: UUID) -> str:
+    return f"ix_{EMBEDDING_TABLE}_{collection_id.hex}"
+
+
+async def ensure_vector_schema():
+    """
+    One-time setup of the embedding table on top of what PGVector creates:
+    a btree index on the collection, so exact search scans only the rows of
+    the dialog, and the fixed `embeddings_dimension` of the embedding column
+    that the ANN indexes need
+    """
+    global _schema_ready, _ann_available
+    if _schema_ready:
+        return
+    async with _schema_lock:
+        if _schema_ready:
+            return
+        async with async_engine.begin() as connection:
+            # Same lock as the extension setup of PGVector, app workers start at once
+            await connection.execute(text("SELECT pg_advisory_xact_lock(1573678846307946496)"))
+            await connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{EMBEDDING_TABLE}_collection_id "
+                f"ON {EMBEDDING_TABLE} (collection_id)"
+            ))
+        if config.embeddings_dimension > 0 and config.vector_index != "none":
+            try:
+                async with async_engine.begin() as connection:
+                    await connection.execute(text("SELECT pg_advisory_xact_lock(1573678846307946496)"))
+                    column_type = (await connection.execute(text(
+                        "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+                        "WHERE attrelid = CAST(:table AS regclass) AND attname = 'embedding'"
+                    ), {"table": EMBEDDING_TABLE})).scalar_one()
+                    dimension_type = f"vector({config.embeddings_dimension})"
+                    if column_type != dimension_type:
+                        await connection.execute(text(
+                            f"ALTER TABLE {EMBEDDING_TABLE} "
+                            f"ALTER COLUMN embedding TYPE {dimension_type}"
+                        ))
+                _ann_available = True
+            except Exception:
+                logger.error(
+                    "Can't set the embedding column to %d dimensions, ANN indexes are disabled",
+                    config.embeddings_dimension, exc_info=True
+                )
+        _schema_ready = True
+
+
+def search_settings() -> str:
+    """
+    Settings of the transaction that runs a similarity search, one statement
+    so they cost a single round trip
+    """
+    # The partial index of a collection only matches a plan with the collection id
+    # inlined, prepared statements must not switch to a generic plan
+    settings = {"plan_cache_mode": "force_custom_plan"}
+    if config.vector_search == "exact":
+        # ANN indexes are only used through index scans
+        settings["enable_indexscan"] = "off"
+    elif config.vector_index == "hnsw":
+        settings["hnsw.ef_search"] = str(int(config.hnsw_ef_search))
+    elif config.vector_index == "ivfflat":
+        settings["ivfflat.probes"] = str(int(config.ivfflat_probes))
+    return "SELECT " + ", ".join(
+        f"set_config('{name}', '{value}', true)" for name, value in settings.items()
+    )
+
+
+def compact_storage() -> bool:
+    """Whether the candidate search runs on the compact representation of the embeddings"""
+    return _ann_available and config.vector_storage != "full"
+
+
+def _indexed_expression() -> str:
+    """Representation of the embeddings the ANN indexes are built on, with its operator class"""
+    dimension = int(config.embeddings_dimension)
+    if config.vector_storage == "halfvec":
+        return f"(CAST(embedding AS halfvec({dimension}))) halfvec_cosine_ops"
+    if config.vector_storage == "binary":
+        return f"(CAST(binary_quantize(embedding) AS bit({dimension}))) bit_hamming_ops"
+    return "embedding vector_cosine_ops"
+
+
+def _candidate_distance() -> str:
+    """Distance of the candidate search, matches the expression of the ANN index"""
+    dimension = int(config.embeddings_dimension)
+    query = f"CAST(:embedding AS vector({dimension}))"
+    if config.vector_storage == "halfvec":
+        return (
+            f"CAST(embedding AS halfvec({dimension})) <=> "
+            f"CAST({query} AS halfvec({dimension}))"
+        )
+    if config.vector_storage == "binary":
+        return (
+            f"CAST(binary_quantize(embedding) AS bit({dimension})) <~> "
+            f"binary_quantize({query})"
+        )
+    return f"embedding <=> {query}"
+
+
+def compact_search_sql() -> str:
+    """
+    Top `candidates` rows of the collection by the compact representation,
+    re-ranked by the exact cosine distance of the full embeddings
+    """
+    dimension = int(config.embeddings_dimension)
+    return (
+        "SELECT id, document, cmetadata, "
+        f"embedding <=> CAST(:embedding AS vector({dimension})) AS distance "
+        "FROM ("
+        f"SELECT id, document, cmetadata, embedding FROM {EMBEDDING_TABLE} "
+        "WHERE collection_id = :collection_id "
+        f"ORDER BY {_candidate_distance()} LIMIT :candidates"
+        ") AS candidates ORDER BY distance LIMIT :k"
+    )
+
+
+def exact_search_sql() -> str:
+    return (
+        f"SELECT id FROM {EMBEDDING_TABLE} WHERE collection_id = :collection_id "
+        "ORDER BY embedding <=> CAST(:embedding AS vector) LIMIT :k"
+    )
+
+
+def _index_ddl(name: str, collection_id: UUID, rows: int) -> str:
+    if config.vector_index == "hnsw":
+        method = "hnsw"
+        options = f"m = {int(config.hnsw_m)}, ef_construction = {int(config.hnsw_ef_construction)}"
+    else:
+        method = "ivfflat"
+        options = f"lists = {_ivfflat_lists(rows)}"
+    return (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {EMBEDDING_TABLE} "
+        f"USING {method} ({_indexed_expression()}) WITH ({options}) "
+        f"WHERE collection_id = '{collection_id}'"
+    )
+
+
+def _ivfflat_lists(rows: int) -> int:
+    if config.ivfflat_lists > 0:
+        return config.ivfflat_lists
+    # pgvector recommendation for up to a million rows
+    return max(1, rows // 1000)
+
+
+async def maintain_collection_index(collection_id: UUID):
+    """
+    Builds the partial ANN index of a collection once it has `vector_index_min_rows`
+    embeddings. Smaller collections are searched exactly through the btree index.
+    An IVFFlat index is rebuilt when the collection outgrows the lists it was built with,
+    an index of another method than `vector_index` or on another `vector_storage` is replaced,
+    and so is an invalid one left behind by an interrupted or failed build
+    """
+    if not _ann_available or collection_id in _maintaining:
+        return
+    _maintaining.add(collection_id)
+    try:
+        name = _index_name(collection_id)
+        # CONCURRENTLY doesn't block the ingestion and can't run in a transaction
+        async with async_engine.connect() as connection:
+            connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            rows = (await connection.execute(
+                text(f"SELECT count(*) FROM {EMBEDDING_TABLE} WHERE collection_id = :id"),
+                {"id": collection_id}
+            )).scalar_one()
+            if rows < config.vector_index_min_rows:
+                return
+            existing = (await connection.execute(text(
+                "SELECT am.amname, obj_description(c.oid, 'pg_class'), i.indisvalid FROM pg_class c "
+                "JOIN pg_am am ON am.oid = c.relam "
+                "JOIN pg_index i ON i.indexrelid = c.oid WHERE c.relname = :name"
+            ), {"name": name})).first()
+            if existing is not None:
+                method, comment, valid = existing
+                storage, _, built_rows = (comment or "").rpartition(" ")
+                outgrown = (
+                    method == "ivfflat"
+                    and config.ivfflat_lists <= 0
+                    and rows > 4 * int(built_rows or 0)
+                )
+                # The comment is set only after a build succeeded, an index
+                # without it was never finished
+                if (
+                    valid
+                    and comment is not None
+                    and method == config.vector_index
+                    and storage == config.vector_storage
+                    and not outgrown
+                ):
+                    return
+                await connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            logger.info("Building %s index of collection %s with %d %s embeddings",
+                        config.vector_index, collection_id, rows, config.vector_storage)
+            await connection.execute(text(_index_ddl(name, collection_id, rows)))
+            # Storage and size of the collection the index was built for
+            await connection.execute(text(
+                f"COMMENT ON INDEX {name} IS '{config.vector_storage} {int(rows)}'"
+            ))
+    finally:
+        _maintaining.discard(collection_id)
+
+
+def _ratio(hit: int | None, read: int | None) -> float | None:
+    total = (hit or 0) + (read or 0)
+    return (hit or 0) / total if total else None
+
+
+async def vector_storage_stats() -> dict:
+    """Size of the embedding table and its indexes and their buffer cache hit rate"""
+    async with async_engine.connect() as connection:
+        table = (await connection.execute(text(
+            "SELECT pg_table_size(relid), pg_total_relation_size(relid) - pg_table_size(relid), "
+            "heap_blks_hit, heap_blks_read, toast_blks_hit, toast_blks_read, "
+            "idx_blks_hit, idx_blks_read "
+            "FROM pg_statio_user_tables WHERE relname = :table"
+        ), {"table": EMBEDDING_TABLE})).first()
+        ann = (await connection.execute(text(
+            "SELECT count(*), coalesce(sum(pg_relation_size(indexrelid)), 0), "
+            "sum(idx_blks_hit), sum(idx_blks_read) "
+            "FROM pg_statio_user_indexes "
+            "WHERE relname = :table AND indexrelname ~ :pattern"
+        ), {"table": EMBEDDING_TABLE, "pattern": f"^ix_{EMBEDDING_TABLE}_[0-9a-f]{{32}}$"})).first()
+    if table is None:
+        return {"storage": config.vector_storage, "compact_search": compact_storage()}
+    return {
+        "storage": config.vector_storage,
+        "compact_search": compact_storage(),
+        "table_bytes": table[0],
+        "indexes_bytes": table[1],
+        "ann_indexes": ann[0],
+        "ann_indexes_bytes": ann[1],
+        "table_hit_rate": _ratio(table[2], table[3]),
+        "toast_hit_rate": _ratio(table[4], table[5]),
+        "indexes_hit_rate": _ratio(table[6], table[7]),
+        "ann_indexes_hit_rate": _ratio(ann[2], ann[3]),
+    }
@@ -1,27 +1,261 @@
+import asyncio
+import contextlib
+import random
+from contextvars import ContextVar
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Sequence
+from uuid import UUID
+
 from langchain_postgres import PGVector
+from langchain_postgres.vectorstores import DistanceStrategy
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.utils.embeddings import EMBEDDINGS
-from api.database.database import async_engine
+from api.database.database import async_engine, get_retrieval_version
 from langchain_core.documents import Document
+from api.utils.background import run_in_background
+from api.utils.metrics import PIPELINE_STAGE_SECONDS
+from api.utils.retrieval_cache import RETRIEVAL_CACHE
+from api.utils.vector_index import (
+    compact_search_sql,
+    compact_storage,
+    ensure_vector_schema,
+    exact_search_sql,
+    maintain_collection_index,
+    search_settings
+)
+from common.metrics.metrics import CallbackCounter
+from config import config
+
+# Set while a similarity search of PGVector runs, its sessions get the search settings
+_searching: ContextVar[bool] = ContextVar("_searching", default=False)
+
+
+@dataclass(frozen=True)
+class _CollectionRef:
+    """Resolved collection, all PGVector needs to filter and insert embeddings"""
+    uuid: UUID
+    name: str
+    cmetadata: dict | None
+
+
+class CachedPGVector(PGVector):
+    """
+    PGVector that sets up the extension, tables and collection once per instance,
+    even under concurrent first calls, and resolves the collection id only once.
+    Searches run with the ANN index settings, other sessions skip them and
+    their round trip, ingestion keeps the index of the
+    collection up to date. With a compact `vector_storage` the candidates are
+    found by the compact representation and re-ranked by the full embeddings
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._init_lock = asyncio.Lock()
+        self._initialized = False
+        self._collection: _CollectionRef | None = None
+
+    async def ainit(self):
+        if self._initialized:
+            return
+        async with self._init_lock:
+            if not self._initialized:
+                await self.acreate_collection()
+                await ensure_vector_schema()
+                self._initialized = True
+
+    @contextlib.asynccontextmanager
+    async def _make_search_session(self) -> AsyncGenerator[AsyncSession, None]:
+        async with super()._make_async_session() as session:
+            await session.execute(text(search_settings()))
+            yield session
+
+    def _make_async_session(self) -> contextlib.AbstractAsyncContextManager[AsyncSession]:
+        if _searching.get():
+            return self._make_search_session()
+        return super()._make_async_session()
+
+    async def asimilarity_search_with_score_by_vector(self, *args: Any, **kwargs: Any) -> list[tuple[Document, float]]:
+        token = _searching.set(True)
+        try:
+            return await super().asimilarity_search_with_score_by_vector(*args, **kwargs)
+        finally:
+            _searching.reset(token)
+
+    async def aadd_embeddings(
+            self,
+            texts: Sequence[str],
+            embeddings: list[list[float]],
+            metadatas: list[dict] | None = None,
+            ids: list[str] | None = None,
+            **kwargs: Any
+        ) -> list[str]:
+        ids = await super().aadd_embeddings(texts, embeddings, metadatas, ids, **kwargs)
+        if self._collection is not None:
+            # Index builds take a while, the upload doesn't wait for them
+            run_in_background(maintain_collection_index(self._collection.uuid))
+        return ids
+
+    async def aget_collection(self, session: AsyncSession) -> Any:
+        if self._collection is not None:
+            return self._collection
+        collection = await super().aget_collection(session)
+        if collection is not None:
+            self._collection = _CollectionRef(collection.uuid, collection.name, collection.cmetadata)
+        return collection
+
+    async def asearch(self, embedding: list[float], k: int = 4) -> list[Document]:
+        if not compact_storage():
+            return await self.asimilarity_search_by_vector(embedding, k=k)
+        async with self._make_search_session() as session:
+            collection = await self.aget_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
+            rows = (await session.execute(text(compact_search_sql()), {
+                "embedding": _vector_literal(embedding),
+                "collection_id": collection.uuid,
+                "candidates": k * max(1, config.vector_rerank_factor),
+                "k": k
+            })).all()
+        return [
+            Document(id=str(row.id), page_content=row.document, metadata=row.cmetadata or {})
+            for row in rows
+        ]
+
+    async def aexact_ids(self, embedding: list[float], k: int = 4) -> list[str]:
+        """Ids of the true nearest neighbours, without any ANN index"""
+        async with super()._make_async_session() as session:
+            await session.execute(text("SET LOCAL enable_indexscan = off"))
+            collection = await self.aget_collection(session)
+            if not collection:
+                return []
+            rows = (await session.execute(text(exact_search_sql()), {
+                "embedding": _vector_literal(embedding),
+                "collection_id": collection.uuid,
+                "k": k
+            })).all()
+        return [str(row.id) for row in rows]
+
+    async def adelete_collection(self) -> None:
+        # The ORM object of the collection is needed to delete it
+        self._collection = None
+        try:
+            await super().adelete_collection()
+        finally:
+            self._collection = None
+            self._initialized = False
+
+
+def _vector_literal(embedding: list[float]) -> str:
+    return "[" + ",".join(map(str, embedding)) + "]"
+
 
-def create_vectorstore(collection_name: str) -> PGVector:
-    return PGVector(
+def create_vectorstore(collection_name: str) -> CachedPGVector:
+    return CachedPGVector(
         EMBEDDINGS, 
         connection=async_engine, 
+        embedding_length=config.embeddings_dimension or None,
         collection_name=collection_name,
+        distance_strategy=DistanceStrategy.COSINE,
         use_jsonb=True,
-        async_mode=True,
-        collection_metadata={
-            "hnsw:space": "cosine"
-        }
+        async_mode=True
     )
 
+
+class VectorStoreRegistry:
+    """Initialized vectorstores by collection name, least recently used ones are evicted"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._stores: OrderedDict[str, CachedPGVector] = OrderedDict()
+
+    async def get(self, collection_name: str) -> CachedPGVector:
+        store = self._stores.get(collection_name)
+        if store is None:
+            store = create_vectorstore(collection_name)
+            self._stores[collection_name] = store
+            while len(self._stores) > self.max_size:
+                self._stores.popitem(last=False)
+        else:
+            self._stores.move_to_end(collection_name)
+        await store.ainit()
+        return store
+
+    def __len__(self) -> int:
+        return len(self._stores)
+
+
+VECTORSTORES = VectorStoreRegistry(config.vectorstore_cache_size)
+
+
+class RecallTracker:
+    """Recall of the approximate search, measured on a sample of the queries against exact search"""
+
+    def __init__(self):
+        self.samples = 0
+        self.found = 0
+        self.expected = 0
+
+    def record(self, ids: list[str], exact_ids: list[str]):
+        self.samples += 1
+        self.found += len(set(ids) & set(exact_ids))
+        self.expected += len(exact_ids)
+
+    @property
+    def recall(self) -> float | None:
+        return self.found / self.expected if self.expected else None
+
+
+RECALL = RecallTracker()
+
+CallbackCounter(
+    "llm_vector_recall_found_total",
+    "True nearest neighbours returned by the sampled approximate searches",
+    lambda: RECALL.found
+)
+CallbackCounter(
+    "llm_vector_recall_expected_total",
+    "True nearest neighbours of the sampled approximate searches",
+    lambda: RECALL.expected
+)
+
+
+async def _measure_recall(vectorstore: CachedPGVector, embedding: list[float], documents: list[Document], k: int):
+    exact_ids = await vectorstore.aexact_ids(embedding, k)
+    RECALL.record([str(document.id) for document in documents], exact_ids)
+
+
 async def load_documents(vectorstore: PGVector, documents: list[Document]):
     await vectorstore.aadd_documents(documents)
 
+async def search_vectorstore(
+    vectorstore: CachedPGVector,
+    query: str,
+    k: int = 4
+) -> tuple[list[float], list[Document]]:
+    """Query embedding and the retrieved documents"""
+    collection = vectorstore.collection_name
+    version = await get_retrieval_version(collection)
+    cached = RETRIEVAL_CACHE.get(collection, query, version)
+    if cached is not None:
+        return cached.embedding, cached.documents
+    # Same as the default retriever, split to time both halves separately
+    with PIPELINE_STAGE_SECONDS.time(stage="embeddings"):
+        embedding = await vectorstore.embeddings.aembed_query(query)
+    with PIPELINE_STAGE_SECONDS.time(stage="pgvector"):
+        documents = await vectorstore.asearch(embedding, k=k)
+    RETRIEVAL_CACHE.put(collection, query, version, embedding, documents)
+    if config.vector_search == "approximate" and random.random() < config.vector_recall_sample_rate:
+        # The exact search is a full scan of the collection, the answer doesn't wait for it
+        run_in_background(_measure_recall(vectorstore, embedding, documents, k))
+    return embedding, documents
+
 async def query_vectorstore(
-    vectorstore: PGVector, 
-    query: str
+    vectorstore: CachedPGVector, 
+    query: str,
+    k: int = 4
 ) -> list[Document]:
-    retriever = vectorstore.as_retriever()
-    return await retriever.ainvoke(query)
\ No newline at end of file
+    _, documents = await search_vectorstore(vectorstore, query, k)
+    return documents
\ No newline at end of file
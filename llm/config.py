@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic import Field, computed_field, SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from sqlalchemy import URL
@@ -29,10 +30,83 @@ class Config(BaseSettings):
     openai_llm: dict = Field({})
 
     embeddings: str = Field("")
+    # Memory for the chunk embeddings kept in process in front of the
+    # embedding_cache table, in bytes (float32, ~3 KB per 768-dim embedding)
+    embeddings_cache_max_bytes: int = Field(64 * 1024 * 1024)
+    # Chunks per request to the embedding model during ingestion, requests in
+    # flight at once, and retries of a failed request with exponential backoff
+    embeddings_batch_size: int = Field(32)
+    embeddings_concurrency: int = Field(4)
+    embeddings_max_retries: int = Field(3)
+    embeddings_retry_backoff: float = Field(1)
+
+    # Initialized vectorstores kept per collection (dialog)
+    vectorstore_cache_size: int = Field(1000)
+
+    # Dimension of the embeddings, required for the ANN indexes. 0 keeps
+    # the embedding column untyped and the search exact
+    embeddings_dimension: int = Field(0)
+    # ANN index built per collection once it has vector_index_min_rows
+    # embeddings, smaller collections are searched exactly
+    vector_index: Literal["hnsw", "ivfflat", "none"] = Field("hnsw")
+    vector_index_min_rows: int = Field(5000)
+    # "exact" ignores the ANN indexes, e.g. to measure their recall
+    vector_search: Literal["approximate", "exact"] = Field("approximate")
+    hnsw_m: int = Field(16)
+    hnsw_ef_construction: int = Field(64)
+    hnsw_ef_search: int = Field(40)
+    # 0 picks rows / 1000 lists and rebuilds the index as the collection grows
+    ivfflat_lists: int = Field(0)
+    ivfflat_probes: int = Field(10)
+    # Representation of the embeddings in the ANN indexes: full float32, half
+    # precision or binary quantized. Compact candidates are re-ranked by the
+    # full embeddings, vector_rerank_factor * k candidates per query
+    vector_storage: Literal["full", "halfvec", "binary"] = Field("full")
+    vector_rerank_factor: int = Field(4)
+    # Share of the approximate searches repeated exactly to measure the recall
+    vector_recall_sample_rate: float = Field(0.0)
+    # Retrievals cached by dialog and normalized query, 0 disables the cache
+    retrieval_cache_size: int = Field(10000)
+
+    # Reuse of earlier answers to similar questions over the same retrieved
+    # documents, for any dialog. Off by default: a cached answer ignores the
+    # dialog history
+    semantic_cache_enabled: bool = Field(False)
+    # Cosine similarity of the query embeddings required to reuse an answer
+    semantic_cache_threshold: float = Field(0.95)
+    semantic_cache_ttl: float = Field(86400)
+    semantic_cache_size: int = Field(10000)
 
     docling_url: str = Field('')
 
     docling_serve_api_key: str = Field("")
+
+    # Share of the chain runs traced to the console, 0 disables tracing
+    trace_sample_rate: float = Field(0.0)
+
+    # Timeouts of the pipeline stages that run before the LLM call, in seconds
+    retrieval_timeout: float = Field(10)
+    history_timeout: float = Field(5)
+    picture_timeout: float = Field(5)
+
+    # Number of latest messages sent to the LLM, older ones are replaced by
+    # a rolling summary. 0 sends the whole dialog
+    history_window: int = Field(20)
+    # Messages that have to fall out of the window before the summary is updated
+    history_summary_batch: int = Field(10)
+
+    # Connection pool of the chat history
+    chat_history_pool_min_size: int = Field(2)
+    chat_history_pool_max_size: int = Field(20)
+    chat_history_pool_max_idle: float = Field(300)
+
+    # Connection pools of the upstream HTTP services
+    asr_pool_size: int = Field(20)
+    docling_pool_size: int = Field(10)
+    http_connect_timeout: float = Field(10)
+    http_keepalive_timeout: float = Field(60)
+    asr_read_timeout: float = Field(600)
+    docling_read_timeout: float = Field(120)
     
 
 config = Config() # type: ignore
\ No newline at end of file
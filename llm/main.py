@@ -2,22 +2,33 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.openapi.docs import get_swagger_ui_html
 from dotenv import load_dotenv
-from langchain_core.globals import set_debug, set_verbose
-
-set_debug(True)
-set_verbose(True)
 
 load_dotenv(".env")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     from api.routers.chat import chat_router
+    from common.auth.auth import token_store
     from common.auth.router import auth_router
+    from common.metrics.router import metrics_router
     from api.routers.vectorstore import vectorstore_router
+    from api.routers.stats import stats_router
+    from api.utils.http import HTTP_CLIENTS
+    from api.database.database import chat_history_pool
+    from api.utils.background import drain_background
     app.include_router(chat_router)
     app.include_router(auth_router)
     app.include_router(vectorstore_router)
+    app.include_router(stats_router)
+    app.include_router(metrics_router)
+    await token_store.start()
+    await HTTP_CLIENTS.start()
+    await chat_history_pool.open(wait=True)
     yield
+    await drain_background()
+    await chat_history_pool.close()
+    await HTTP_CLIENTS.close()
+    await token_store.stop()
 
 app = FastAPI(
     title="LLM Сервис",
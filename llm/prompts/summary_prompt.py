@@ -0,0 +1,13 @@
+from langchain_core.prompts import ChatPromptTemplate
+
+def create_summary_prompt():
+    return ChatPromptTemplate.from_messages([
+        ("system",
+         "Ты ведёшь краткое содержание диалога студента с ассистентом. "
+         "Дополни текущее краткое содержание новыми сообщениями. "
+         "Сохрани темы, вопросы студента, ключевые ответы, договорённости и факты о студенте. "
+         "Пиши сжато, не более 300 слов. Верни только обновлённое краткое содержание."),
+        ("human",
+         "### Текущее краткое содержание\n{summary}\n\n"
+         "### Новые сообщения\n{messages}")
+    ])
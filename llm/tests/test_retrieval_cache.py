@@ -0,0 +1,68 @@
+from langchain_core.documents import Document
+
+from api.utils.retrieval_cache import RetrievalCache, normalize_query
+
+EMBEDDING = [0.1, 0.2]
+DOCUMENTS = [Document(page_content="text")]
+
+
+def test_normalized_query_hits():
+    cache = RetrievalCache(max_size=10)
+    cache.put("dialog", "What is a cache?", 0, EMBEDDING, DOCUMENTS)
+
+    entry = cache.get("dialog", "  what IS   a cache ", 0)
+
+    assert entry is not None
+    assert entry.embedding == EMBEDDING
+    assert entry.documents == DOCUMENTS
+    assert normalize_query("What is a cache?!") == "what is a cache"
+
+
+def test_new_version_invalidates_collection():
+    cache = RetrievalCache(max_size=10)
+    cache.put("dialog", "query", 0, EMBEDDING, DOCUMENTS)
+    cache.put("other", "query", 0, EMBEDDING, DOCUMENTS)
+
+    assert cache.get("dialog", "query", 1) is None
+    # The stale entry is dropped, not kept until the old version comes back
+    assert cache.get("dialog", "query", 0) is None
+    assert cache.get("other", "query", 0) is not None
+
+
+def test_search_racing_an_update_is_not_served():
+    cache = RetrievalCache(max_size=10)
+    # The search started before the documents changed and finished after
+    cache.put("dialog", "query", 3, EMBEDDING, DOCUMENTS)
+
+    assert cache.get("dialog", "query", 4) is None
+
+
+def test_least_recently_used_is_evicted():
+    cache = RetrievalCache(max_size=2)
+    cache.put("dialog", "first", 0, EMBEDDING, DOCUMENTS)
+    cache.put("dialog", "second", 0, EMBEDDING, DOCUMENTS)
+    cache.get("dialog", "first", 0)
+    cache.put("dialog", "third", 0, EMBEDDING, DOCUMENTS)
+
+    assert len(cache) == 2
+    assert cache.get("dialog", "second", 0) is None
+    assert cache.get("dialog", "first", 0) is not None
+
+
+def test_disabled_cache_stores_nothing():
+    cache = RetrievalCache(max_size=0)
+    cache.put("dialog", "query", 0, EMBEDDING, DOCUMENTS)
+
+    assert len(cache) == 0
+    assert cache.get("dialog", "query", 0) is None
+
+
+def test_stats():
+    cache = RetrievalCache(max_size=10)
+    assert cache.stats()["hit_rate"] is None
+
+    cache.get("dialog", "query", 0)
+    cache.put("dialog", "query", 0, EMBEDDING, DOCUMENTS)
+    cache.get("dialog", "query", 0)
+
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1, "hit_rate": 0.5}